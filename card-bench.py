@@ -0,0 +1,222 @@
+#!/opt/homebrew/bin/python3
+
+import argparse
+import functools
+import io
+import itertools
+import json
+from multiprocessing import Pool
+import resource
+import sys
+import time
+
+import cairo
+import cardsheet
+import domino
+import scout
+
+
+GAMES = {'domino': domino, 'scout': scout}
+BACKENDS = ['pdf', 'svg', 'png']
+
+# domino: highest value of the set, scout: number of values
+DECK_SIZES = {'domino': [6, 12, 15], 'scout': [10, 20, 40]}
+
+# calls per drawing function in the micro benchmarks
+DRAW_CALLS = 500
+PNG_DPI = 150
+# the generators' default imposition
+PAPER = ['letter']
+MARGIN = 18
+
+# a result this much worse than the baseline is flagged
+REGRESSION = 0.10
+
+
+def make_deck(game, size):
+  if game == 'domino':
+    return list(domino.combinations_two(0, size + 1, contain_self=True,
+                                        repeat=2))
+  return list(itertools.combinations(range(0, size), 2))
+
+
+def peak_rss_kb():
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # bytes on macOS, kilobytes on Linux
+  return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def use_font(game, font):
+  # Gill Sans is not installed on build servers; a fixed fallback keeps the
+  # numbers comparable between machines
+  if font:
+    GAMES[game].FONT = font
+
+
+def make_layout(game):
+  module = GAMES[game]
+  return cardsheet.impose(module.CARD_WIDTH, module.CARD_HEIGHT, PAPER,
+                          MARGIN)
+
+
+def render_side(game, backend, layout, page, back, shared_faces=True):
+  module = GAMES[game]
+  buf = io.BytesIO()
+  if backend == 'png':
+    scale = PNG_DPI / 72
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                 int(layout.width * scale),
+                                 int(layout.height * scale))
+    ctx = cairo.Context(surface)
+    ctx.scale(scale, scale)
+    module.GAME.draw_page(ctx, page, layout, back=back,
+                          shared_faces=shared_faces)
+    surface.write_to_png(buf)
+  else:
+    surface = cairo.SVGSurface(buf, layout.width, layout.height)
+    module.GAME.draw_page(cairo.Context(surface), page, layout, back=back,
+                          shared_faces=shared_faces)
+  surface.finish()
+  return len(buf.getvalue())
+
+
+def bench_deck(game, backend, size, font, shared_faces=True):
+  use_font(game, font)
+  module = GAMES[game]
+  cards = make_deck(game, size)
+  layout = make_layout(game)
+  per_page = len(layout.slots)
+
+  start = time.perf_counter()
+  page_count = 0
+  if backend == 'pdf':
+    # same path as the generators' default single-pass output
+    buf = io.BytesIO()
+    surface = cairo.PDFSurface(buf, layout.width, layout.height)
+    draw_page = functools.partial(module.GAME.draw_page, layout=layout,
+                                  shared_faces=shared_faces)
+    for page in cardsheet.pages(cards, per_page):
+      cardsheet.draw_pages(surface, draw_page, page)
+      page_count += 1
+    surface.finish()
+    size_bytes = len(buf.getvalue())
+  else:
+    # svg and png surfaces hold one page each
+    size_bytes = 0
+    for page in cardsheet.pages(cards, per_page):
+      size_bytes += render_side(game, backend, layout, page, False,
+                                shared_faces)
+      size_bytes += render_side(game, backend, layout, page, True,
+                                shared_faces)
+      page_count += 1
+  elapsed = time.perf_counter() - start
+
+  return {'cards': len(cards),
+          'pages': page_count,
+          'cards_per_sec': len(cards) / elapsed,
+          'page_ms': elapsed / page_count * 1000,
+          'peak_rss_kb': peak_rss_kb(),
+          'bytes': size_bytes}
+
+
+def bench_draw(game, font):
+  use_font(game, font)
+  module = GAMES[game]
+  layout = make_layout(game)
+  draws = {
+      'triangle': lambda ctx, i: module.triangle(
+          ctx, 0, 0, module.number_color(i % 10)),
+      'draw_text major': lambda ctx, i: module.draw_text(
+          ctx, True, str(i % 10), 0, 0),
+      'draw_text minor': lambda ctx, i: module.draw_text(
+          ctx, False, str(i % 10), 0, 0),
+      'draw_box': lambda ctx, i: module.draw_box(ctx, 0, 0),
+      'draw_outline': lambda ctx, i: module.draw_outline(ctx, 0, 0),
+      'draw_cuts': lambda ctx, i: module.GAME.draw_cuts(ctx, layout),
+  }
+
+  results = {}
+  for name, draw in draws.items():
+    surface = cairo.PDFSurface(io.BytesIO(), layout.width, layout.height)
+    ctx = cairo.Context(surface)
+    start = time.perf_counter()
+    for i in range(DRAW_CALLS):
+      draw(ctx, i)
+    elapsed = time.perf_counter() - start
+    surface.finish()
+    results[name] = {'calls_per_sec': DRAW_CALLS / elapsed}
+  return results
+
+
+def run_isolated(func, *args):
+  # one fresh process per case, so peak RSS and warm caches do not leak
+  # from one case into the next
+  with Pool(1) as pool:
+    return pool.apply(func, args)
+
+
+def compare(name, result, baseline):
+  old = baseline.get(name)
+  if old is None:
+    return ''
+  notes = []
+  # higher is better for rates, lower is better for everything else
+  for field, value in result.items():
+    if field not in old or not old[field] or field in ('cards', 'pages'):
+      continue
+    change = value / old[field] - 1
+    worse = -change if field.endswith('_per_sec') else change
+    notes.append('{} {:+.0%}{}'.format(field, change,
+                                       ' !' if worse > REGRESSION else ''))
+  return '  (' + ', '.join(notes) + ')'
+
+
+def print_result(name, result, baseline):
+  fields = '  '.join('{}={}'.format(field, round(value, 1))
+                     for field, value in result.items())
+  print('{:32}{}{}'.format(name, fields, compare(name, result, baseline)))
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(
+      description='benchmark the domino/scout card renderers')
+  parser.add_argument('--games', nargs='+', choices=list(GAMES),
+                      default=list(GAMES))
+  parser.add_argument('--backends', nargs='+', choices=BACKENDS,
+                      default=BACKENDS)
+  parser.add_argument('--font', default='sans-serif',
+                      help="font to draw with ('' keeps the generator's own)")
+  parser.add_argument('--inline-faces', action='store_true',
+                      help='also run every deck with --inline-faces, to '
+                      'compare output size and speed with shared faces')
+  parser.add_argument('--baseline', metavar='FILE',
+                      help='compare against results saved with --save')
+  parser.add_argument('--save', metavar='FILE',
+                      help='write the results as a JSON baseline')
+  args = parser.parse_args()
+
+  baseline = {}
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+
+  results = {}
+  for game in args.games:
+    for name, result in run_isolated(bench_draw, game, args.font).items():
+      name = '{} {}'.format(game, name)
+      results[name] = result
+      print_result(name, result, baseline)
+
+    for backend in args.backends:
+      for size in DECK_SIZES[game]:
+        for shared_faces in [True, False][:1 + args.inline_faces]:
+          name = '{} {} {}{}'.format(game, backend, size,
+                                     '' if shared_faces else ' inline')
+          result = run_isolated(bench_deck, game, backend, size, args.font,
+                                shared_faces)
+          results[name] = result
+          print_result(name, result, baseline)
+
+  if args.save:
+    with open(args.save, 'w') as f:
+      json.dump(results, f, indent=2, sort_keys=True)
@@ -0,0 +1,670 @@
+import argparse
+from collections import deque
+import colorsys
+from contextlib import nullcontext
+import functools
+import hashlib
+import io
+import itertools
+from math import ceil, floor, pi
+from multiprocessing import Pool
+import os
+import sys
+
+import cairo
+
+
+# jobs a worker runs before it is replaced, see map_jobs
+WORKER_TASKS = 16
+# jobs queued per worker before waiting on the oldest one
+JOBS_PER_WORKER = 2
+
+# hue step between generated number colours (golden ratio)
+NUMBER_HUE_STEP = 0.618033988749895
+
+
+class Color:
+  def __init__(self, r, g, b, a=1):
+    self.r = nrgb(r)
+    self.g = nrgb(g)
+    self.b = nrgb(b)
+    self.a = a
+
+  def __repr__(self):
+    return 'Color({}, {}, {}, {})'.format(self.r, self.g, self.b, self.a)
+
+
+def set_color(ctx: cairo.Context, color):
+  ctx.set_source_rgba(color.r, color.g, color.b, color.a)
+
+
+def ppi(inches):
+  return int(inches * 72)
+
+
+def nrgb(raw: int):
+  return float(raw) / 255
+
+
+def number_color(colors, value: int):
+  # the hand-picked colours first, then spread-out hues for bigger decks
+  if value < len(colors):
+    return colors[value]
+  hue = (value - len(colors)) * NUMBER_HUE_STEP % 1
+  r, g, b = colorsys.hsv_to_rgb(hue, 0.8, 0.95)
+  return Color(r * 255, g * 255, b * 255)
+
+
+def pages(cards, per_page):
+  # split the card sequence into page-sized lists, in order
+  cards = iter(cards)
+  while True:
+    page = list(itertools.islice(cards, per_page))
+    if not page:
+      return
+    yield page
+
+
+# paper stock in points, portrait
+PAPER_SIZES = {'letter': (612, 792),
+               'legal': (612, 1008),
+               'tabloid': (792, 1224),
+               'a4': (595, 842),
+               'a3': (842, 1191)}
+
+
+class Layout:
+  # Cards are placed in blocks, each a grid of identical slots; a block is
+  # (x, y, cols, rows, slot width, slot height, angle), with x/y the block's
+  # top left corner. Rotated slots hold the card turned a quarter turn.
+  def __init__(self, paper, width, height, margin, blocks):
+    self.paper = paper
+    self.width = width
+    self.height = height
+    self.margin = margin
+    self.blocks = blocks
+
+    # fill each block from its bottom row up, left to right
+    self.slots = []
+    for x, y, cols, rows, w, h, angle in blocks:
+      for row in reversed(range(rows)):
+        for col in range(cols):
+          self.slots.append((x + w*col, y + h*row, w, h, angle))
+
+    # Backs are mirrored left to right, which lines up with the fronts when
+    # the sheet is flipped about its vertical axis
+    self.back_slots = [(width - x - w, y, w, h, -angle)
+                       for x, y, w, h, angle in self.slots]
+
+  def __repr__(self):
+    return 'Layout({!r}, {}, {}, {}, {!r})'.format(
+        self.paper, self.width, self.height, self.margin, self.blocks)
+
+  def describe(self):
+    orientation = 'landscape' if self.width > self.height else 'portrait'
+    edge = 'short' if self.width > self.height else 'long'
+    return '{} {}: {} cards per sheet, duplex flip on {} edge'.format(
+        self.paper, orientation, len(self.slots), edge)
+
+  def cuts(self):
+    # Cut marks run in from the sheet edge to each grid line. A block only
+    # gets marks on a side where no other block sits between it and the
+    # edge.
+    for block in self.blocks:
+      x, y, cols, rows, w, h, _ = block
+      right = x + cols*w
+      bottom = y + rows*h
+      clear = {'top': True, 'bottom': True, 'left': True, 'right': True}
+      for ox, oy, ocols, orows, ow, oh, _ in self.blocks:
+        oright = ox + ocols*ow
+        obottom = oy + orows*oh
+        overlap_x = ox < right and x < oright
+        overlap_y = oy < bottom and y < obottom
+        if overlap_x and obottom <= y:
+          clear['top'] = False
+        if overlap_x and oy >= bottom:
+          clear['bottom'] = False
+        if overlap_y and oright <= x:
+          clear['left'] = False
+        if overlap_y and ox >= right:
+          clear['right'] = False
+
+      length = self.margin / 1.5
+      for i in reversed(range(rows + 1)):
+        if clear['left']:
+          yield 0, y + h*i, length, 0
+        if clear['right']:
+          yield self.width, y + h*i, -length, 0
+      for i in range(cols + 1):
+        if clear['bottom']:
+          yield x + w*i, self.height, 0, -length
+        if clear['top']:
+          yield x + w*i, 0, 0, length
+
+  def back_cuts(self):
+    # the cut marks mirrored like back_slots, so they line up with the backs
+    for x, y, dx, dy in self.cuts():
+      yield self.width - x, y, -dx, dy
+
+
+def layouts(paper, card_width, card_height, margin):
+  # Every sheet orientation and card orientation, each on its own and with
+  # the space left over filled by cards turned the other way.
+  portrait_width, portrait_height = PAPER_SIZES[paper]
+  for width, height in [(portrait_height, portrait_width),
+                        (portrait_width, portrait_height)]:
+    usable_width = width - margin*2
+    usable_height = height - margin*2
+    for w, h, angle, other in [
+        (card_width, card_height, 0, (card_height, card_width, -pi/2)),
+        (card_height, card_width, -pi/2, (card_width, card_height, 0))]:
+      cols = floor(usable_width / w)
+      rows = floor(usable_height / h)
+      if not cols or not rows:
+        continue
+      # anchored to the bottom left margins
+      main = (margin, height - margin - rows*h, cols, rows, w, h, angle)
+      yield Layout(paper, width, height, margin, [main])
+
+      ow, oh, oangle = other
+      # strip above the main block
+      strip_cols = floor(usable_width / ow)
+      strip_rows = floor((usable_height - rows*h) / oh)
+      if strip_cols and strip_rows:
+        strip = (margin, main[1] - strip_rows*oh, strip_cols, strip_rows,
+                 ow, oh, oangle)
+        yield Layout(paper, width, height, margin, [main, strip])
+
+      # strip right of the main block
+      strip_cols = floor((usable_width - cols*w) / ow)
+      strip_rows = floor(usable_height / oh)
+      if strip_cols and strip_rows:
+        strip = (margin + cols*w, height - margin - strip_rows*oh,
+                 strip_cols, strip_rows, ow, oh, oangle)
+        yield Layout(paper, width, height, margin, [main, strip])
+
+
+def impose(card_width, card_height, papers, margin):
+  # The layout that wastes the least paper: most card area per sheet area,
+  # then most cards per sheet, then fewest blocks (simplest to cut). Ties
+  # keep the first candidate, so a plain landscape grid wins when it can.
+  def score(layout):
+    fill = len(layout.slots) * card_width * card_height / \
+        (layout.width * layout.height)
+    return (round(fill, 6), len(layout.slots), -len(layout.blocks))
+
+  candidates = [layout for paper in papers
+                for layout in layouts(paper, card_width, card_height, margin)]
+  if not candidates:
+    raise ValueError('a {}x{} card does not fit on {}'.format(
+        card_width, card_height, ', '.join(papers)))
+  return max(candidates, key=score)
+
+
+def place(ctx: cairo.Context, slot, card_rect):
+  # Map a card drawn at card_rect onto a slot, turning it about its centre
+  # for rotated slots.
+  x, y, w, h, angle = slot
+  card_x, card_y, card_width, card_height = card_rect
+  ctx.translate(x + w/2, y + h/2)
+  ctx.rotate(angle)
+  ctx.translate(-(card_x + card_width/2), -(card_y + card_height/2))
+
+
+# (font, size, string) -> (text extents, glyph outline at the origin)
+_text_layouts = {}
+
+
+def text_layout(ctx: cairo.Context, font, size, s):
+  # Text is shaped once per process; afterwards only the cached outline is
+  # replayed with append_path.
+  key = (font, size, s)
+  layout = _text_layouts.get(key)
+  if layout is None:
+    ctx.save()
+    ctx.identity_matrix()
+    ctx.new_path()
+    ctx.select_font_face(font, cairo.FONT_SLANT_NORMAL,
+                         cairo.FONT_WEIGHT_BOLD)
+    ctx.set_font_size(size)
+    extents = ctx.text_extents(s)
+    ctx.move_to(0, 0)
+    ctx.text_path(s)
+    layout = (extents, ctx.copy_path())
+    ctx.new_path()
+    ctx.restore()
+    _text_layouts[key] = layout
+  return layout
+
+
+def number_layout(ctx: cairo.Context, font, size, s, room):
+  # text_layout for card values: numbers of several digits are shrunk to at
+  # most room wide, the space the card design leaves before the card edge;
+  # single digits keep the size they were designed at
+  extents, path = text_layout(ctx, font, size, s)
+  if len(s) > 1 and extents.width > room:
+    extents, path = text_layout(ctx, font, size * room / extents.width, s)
+  return extents, path
+
+
+def text_path(ctx: cairo.Context, path, x, y):
+  # the path outlives save/restore, only the translation is undone
+  ctx.save()
+  ctx.translate(x, y)
+  ctx.append_path(path)
+  ctx.restore()
+
+
+# key -> recording surface, drawn once per process
+_stamps = {}
+
+
+def stamp(ctx: cairo.Context, key, extents, dx, dy, draw, *args):
+  # Draw into a recording surface the first time a key is seen, then paint
+  # that surface at an offset. Vector backends write the recording once and
+  # reference it from every page that uses it.
+  surface = _stamps.get(key)
+  if surface is None:
+    surface = cairo.RecordingSurface(cairo.Content.COLOR_ALPHA,
+                                     cairo.Rectangle(*extents))
+    draw(cairo.Context(surface), *args)
+    _stamps[key] = surface
+
+  ctx.save()
+  ctx.translate(dx, dy)
+  ctx.set_source_surface(surface, 0, 0)
+  ctx.paint()
+  ctx.restore()
+
+
+def draw_pages(surface, draw_page, page):
+  # front and back of a sheet go on consecutive pages for duplex printing
+  ctx = cairo.Context(surface)
+  draw_page(ctx, page)
+  surface.show_page()
+
+  ctx = cairo.Context(surface)
+  draw_page(ctx, page, back=True)
+  surface.show_page()
+
+
+def render_pdf_page(draw_page, width, height, page):
+  buf = io.BytesIO()
+  surface = cairo.PDFSurface(buf, width, height)
+  draw_pages(surface, draw_page, page)
+  surface.finish()
+  return buf.getvalue()
+
+
+def render_svg_page(draw_page, width, height, stem, file_idx, page):
+  surface = cairo.SVGSurface(
+      '{}-{}.svg'.format(stem, file_idx), width, height)
+  surface_back = cairo.SVGSurface(
+      '{}-Back{}.svg'.format(stem, file_idx), width, height)
+
+  draw_page(cairo.Context(surface), page)
+  draw_page(cairo.Context(surface_back), page, back=True)
+
+  surface.finish()
+  surface_back.finish()
+
+
+def render_png(draw, width, height, dpi, filename, *args, **kwargs):
+  # width and height are in points; the bitmap is scaled up to the dpi
+  scale = dpi / 72
+  surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, ceil(width * scale),
+                               ceil(height * scale))
+  ctx = cairo.Context(surface)
+  ctx.scale(scale, scale)
+  draw(ctx, *args, **kwargs)
+  surface.write_to_png(filename)
+  surface.finish()
+
+
+def render_png_page(draw_page, width, height, dpi, stem, file_idx, page):
+  render_png(draw_page, width, height, dpi,
+             '{}-{}.png'.format(stem, file_idx), page)
+  render_png(draw_page, width, height, dpi,
+             '{}-Back{}.png'.format(stem, file_idx), page, back=True)
+
+
+def render_png_cards(draw_card, width, height, dpi, stem, card_idx, cards):
+  for card in cards:
+    render_png(draw_card, width, height, dpi,
+               '{}-{:03d}.png'.format(stem, card_idx), card)
+    card_idx += 1
+
+
+def _run(job):
+  return job[0](*job[1:])
+
+
+def map_jobs(jobs, workers=1):
+  # Results come back in job order. Jobs are pulled lazily and only a few
+  # per worker are in flight, so memory does not grow with the deck.
+  # Workers are replaced every WORKER_TASKS jobs, so a worker never holds
+  # more than one page surface plus its caches.
+  if workers == 1:
+    yield from map(_run, jobs)
+    return
+
+  window = (workers or os.cpu_count()) * JOBS_PER_WORKER
+  with Pool(workers, maxtasksperchild=WORKER_TASKS) as pool:
+    in_flight = deque()
+    for job in jobs:
+      in_flight.append(pool.apply_async(_run, (job,)))
+      if len(in_flight) >= window:
+        yield in_flight.popleft().get()
+    while in_flight:
+      yield in_flight.popleft().get()
+
+
+def run_jobs(jobs, workers=1):
+  for _ in map_jobs(jobs, workers):
+    pass
+
+
+def open_output(output):
+  if output == '-':
+    return nullcontext(sys.stdout.buffer)
+  return open(output, 'wb')
+
+
+def output_stem(output):
+  return 'cards' if output == '-' else os.path.splitext(output)[0]
+
+
+def render_pdf(cards, draw_page, per_page, width, height, output):
+  # Single pass: every page goes straight into one surface, so nothing is
+  # written to disk except the final document.
+  with open_output(output) as stream:
+    surface = cairo.PDFSurface(stream, width, height)
+    for page in pages(cards, per_page):
+      draw_pages(surface, draw_page, page)
+    surface.finish()
+
+
+def render_pdf_parallel(cards, draw_page, per_page, width, height, output,
+                        workers=None):
+  # Each worker renders one front/back pair into memory; the pairs are then
+  # merged in deck order.
+  from PyPDF2 import PdfMerger, PdfReader
+
+  jobs = ((render_pdf_page, draw_page, width, height, page)
+          for page in pages(cards, per_page))
+  combined = PdfMerger()
+  for pdf in map_jobs(jobs, workers):
+    combined.append(PdfReader(io.BytesIO(pdf)))
+
+  with open_output(output) as stream:
+    combined.write(stream)
+
+
+def fingerprint(namespace, skip, *extra):
+  # hash of a generator's UPPER_CASE style constants plus whatever else
+  # went into a page
+  constants = sorted((name, repr(value)) for name, value in namespace.items()
+                     if name.isupper() and name not in skip)
+  return hashlib.sha256(repr((constants, extra)).encode()).hexdigest()
+
+
+def render_pdf_cached(cards, draw_page, page_key, per_page, width, height,
+                      output, cache_dir, workers=1):
+  # Every front/back pair is kept in cache_dir under page_key(page), a hash
+  # of everything that is drawn on it. Only pairs with a new hash are
+  # rendered; the document is then spliced together from the cache.
+  from PyPDF2 import PdfMerger
+
+  os.makedirs(cache_dir, exist_ok=True)
+  paths = []
+  missing = {}
+  for page in pages(cards, per_page):
+    path = os.path.join(cache_dir, page_key(page) + '.pdf')
+    paths.append(path)
+    if not os.path.exists(path):
+      missing[path] = page
+
+  jobs = ((render_pdf_page, draw_page, width, height, page)
+          for page in missing.values())
+  for path, pdf in zip(missing, map_jobs(jobs, workers)):
+    # write then rename, so a build sharing the cache never sees half a page
+    tmp = '{}.{}'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+      f.write(pdf)
+    os.replace(tmp, path)
+  print('rendered {} of {} pages'.format(len(missing), len(paths)),
+        file=sys.stderr)
+
+  combined = PdfMerger()
+  for path in paths:
+    combined.append(path)
+  with open_output(output) as stream:
+    combined.write(stream)
+  combined.close()
+
+
+def render_cards(cards, draw_card, per_page, width, height, output, dpi=300,
+                 workers=1):
+  # One PNG per card front plus a single back, since all backs are the same.
+  # Cards are handed out a page at a time to keep the job count down.
+  stem = output_stem(output)
+  cards = iter(cards)
+  first = next(cards, None)
+  if first is None:
+    return
+  render_png(draw_card, width, height, dpi, '{}-Back.png'.format(stem),
+             first, back=True)
+
+  jobs = ((render_png_cards, draw_card, width, height, dpi, stem,
+           page_idx * per_page, page)
+          for page_idx, page in enumerate(
+              pages(itertools.chain([first], cards), per_page)))
+  run_jobs(jobs, workers)
+
+
+def render(cards, draw_page, per_page, width, height, output, fmt='pdf',
+           workers=1, dpi=300, page_key=None, cache_dir=None):
+  if fmt == 'svg':
+    jobs = ((render_svg_page, draw_page, width, height, output_stem(output),
+             file_idx, page)
+            for file_idx, page in enumerate(pages(cards, per_page)))
+    run_jobs(jobs, workers)
+    return
+  elif fmt == 'png':
+    jobs = ((render_png_page, draw_page, width, height, dpi,
+             output_stem(output), file_idx, page)
+            for file_idx, page in enumerate(pages(cards, per_page)))
+    run_jobs(jobs, workers)
+    return
+  elif cache_dir:
+    render_pdf_cached(cards, draw_page, page_key, per_page, width, height,
+                      output, cache_dir, workers)
+  elif workers == 1:
+    render_pdf(cards, draw_page, per_page, width, height, output)
+  else:
+    render_pdf_parallel(cards, draw_page, per_page, width, height, output,
+                        workers)
+
+  if output != '-':
+    print('{}: {} bytes'.format(output, os.path.getsize(output)),
+          file=sys.stderr)
+
+
+class CardGame:
+  # A deck of two-value cards (domino tiles, Scout cards) and how to draw
+  # it. The game module gives its geometry and drawing primitives, each
+  # drawing a card in slot (0, 0) of the game's sheet at card_rect; this
+  # builds card faces, pages and the command line from them. A card face is
+  # two halves, each the triangle, big number and badge box of one value
+  # with the other value in the badge, the right half turned about the card
+  # centre.
+  def __init__(self, module, name, card_rect, card_extents, cuts_color,
+               number_color, triangle, draw_text, draw_box, rot_card,
+               draw_outline, draw_back, key_extra=()):
+    # module: the game module's name, whose style constants key cached pages
+    self.module = module
+    self.name = name
+    self.card_rect = card_rect
+    self.card_extents = card_extents
+    self.cuts_color = cuts_color
+    self.number_color = number_color
+    self.triangle = triangle
+    self.draw_text = draw_text
+    self.draw_box = draw_box
+    self.rot_card = rot_card
+    self.draw_outline = draw_outline
+    self.draw_back = draw_back
+    self.key_extra = key_extra
+
+  def draw_cuts(self, ctx: cairo.Context, layout: Layout, back=False):
+    set_color(ctx, self.cuts_color)
+    ctx.set_line_width(1)
+
+    for x, y, dx, dy in layout.back_cuts() if back else layout.cuts():
+      ctx.move_to(x, y)
+      ctx.rel_line_to(dx, dy)
+
+    ctx.stroke()
+
+  def draw_half(self, ctx: cairo.Context, value: int, xi: int, yi: int):
+    self.triangle(ctx, xi, yi, self.number_color(value))
+    self.draw_text(ctx, True, str(value), xi, yi)
+    self.draw_box(ctx, xi, yi)
+
+  def draw_front(self, ctx: cairo.Context, card, xi: int, yi: int):
+    left, right = card
+
+    # Front Left Side
+    self.draw_half(ctx, left, xi, yi)
+    self.draw_text(ctx, False, str(right), xi, yi)
+
+    self.rot_card(ctx, xi, yi)
+
+    # Front Rigth Side
+    self.draw_half(ctx, right, xi, yi)
+    self.draw_text(ctx, False, str(left), xi, yi)
+
+    self.rot_card(ctx, xi, yi)
+
+    self.draw_outline(ctx, xi, yi)
+
+  def stamp_front(self, ctx: cairo.Context, card, xi: int, yi: int):
+    # Same layers as draw_front, but each half face and each corner badge is
+    # recorded once per value and stamped; the right side is the left side's
+    # stamp rotated about the card centre.
+    left, right = card
+    _, _, card_width, card_height = self.card_rect
+
+    ctx.save()
+    ctx.translate(card_width*xi, -card_height*yi)
+
+    # Front Left Side
+    stamp(ctx, (self.name, 'half', left), self.card_extents, 0, 0,
+          self.draw_half, left, 0, 0)
+    stamp(ctx, (self.name, 'badge', right), self.card_extents, 0, 0,
+          self.draw_text, False, str(right), 0, 0)
+
+    self.rot_card(ctx, 0, 0)
+
+    # Front Rigth Side
+    stamp(ctx, (self.name, 'half', right), self.card_extents, 0, 0,
+          self.draw_half, right, 0, 0)
+    stamp(ctx, (self.name, 'badge', left), self.card_extents, 0, 0,
+          self.draw_text, False, str(left), 0, 0)
+
+    ctx.restore()
+
+    self.draw_outline(ctx, xi, yi)
+
+  def stamp_back(self, ctx: cairo.Context, xi: int, yi: int):
+    # every back is the same, so it is drawn once and stamped into each slot
+    _, _, card_width, card_height = self.card_rect
+    stamp(ctx, (self.name, 'back'), self.card_extents,
+          card_width*xi, -card_height*yi, self.draw_back, 0, 0)
+
+  def draw_side(self, ctx: cairo.Context, card, back, shared_faces):
+    if back:
+      self.stamp_back(ctx, 0, 0)
+    elif shared_faces:
+      self.stamp_front(ctx, card, 0, 0)
+    else:
+      self.draw_front(ctx, card, 0, 0)
+
+  def draw_page(self, ctx: cairo.Context, page, layout: Layout, back=False,
+                shared_faces=True):
+    self.draw_cuts(ctx, layout, back)
+    slots = layout.back_slots if back else layout.slots
+    for slot, card in zip(slots, page):
+      ctx.save()
+      place(ctx, slot, self.card_rect)
+      self.draw_side(ctx, card, back, shared_faces)
+      ctx.restore()
+
+  def draw_card(self, ctx: cairo.Context, card, back=False, shared_faces=True):
+    # a single card with its top left corner at the origin
+    card_x, card_y, _, _ = self.card_rect
+    ctx.translate(-card_x, -card_y)
+    self.draw_side(ctx, card, back, shared_faces)
+
+  def page_key(self, page, layout: Layout, shared_faces=True):
+    # Only the number colours that appear on the page go into its key, so a
+    # colour change re-renders just the pages using that colour.
+    colors = [self.number_color(value) for value in sorted(set().union(*page))]
+    return fingerprint(vars(sys.modules[self.module]),
+                       ['NUMBER_COLORS', 'GAME'], page, colors, layout,
+                       shared_faces, *self.key_extra)
+
+  def run(self, cards, args):
+    # render the deck as the options from argument_parser ask
+    card_width, card_height = self.card_rect[2:]
+    workers = args.workers or None
+    layout = impose(card_width, card_height, args.paper, ppi(args.margin))
+    shared_faces = not args.inline_faces
+    if args.format == 'png' and args.per_card:
+      draw = functools.partial(self.draw_card, shared_faces=shared_faces)
+      render_cards(cards, draw, len(layout.slots), card_width, card_height,
+                   args.output, args.dpi, workers)
+    else:
+      print(layout.describe(), file=sys.stderr)
+      draw = functools.partial(self.draw_page, layout=layout,
+                               shared_faces=shared_faces)
+      key = functools.partial(self.page_key, layout=layout,
+                              shared_faces=shared_faces)
+      render(cards, draw, len(layout.slots), layout.width, layout.height,
+             args.output, args.format, workers, args.dpi, key, args.cache)
+
+
+def worker_count(text):
+  # argparse type for --workers: 0 (one per CPU) or more
+  count = int(text)
+  if count < 0:
+    raise argparse.ArgumentTypeError('{} is not 0 or more'.format(text))
+  return count
+
+
+def argument_parser(output, fmt='pdf'):
+  # the options every generator shares; CardGame.run takes the parsed result
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--paper', nargs='+', default=['letter'],
+                      choices=list(PAPER_SIZES),
+                      help='paper stock(s) to lay the cards out on; with '
+                      'several, the one that wastes the least is used')
+  parser.add_argument('--margin', type=float, default=0.25,
+                      help='smallest margin around the cards, in inches')
+  parser.add_argument('--format', choices=['pdf', 'svg', 'png'], default=fmt)
+  parser.add_argument('--dpi', type=int, default=300,
+                      help='resolution of png output')
+  parser.add_argument('--per-card', action='store_true',
+                      help='write one png per card instead of per page')
+  parser.add_argument('-o', '--output', default=output,
+                      help="output file, or '-' to write the PDF to stdout")
+  parser.add_argument('--workers', type=worker_count, default=1,
+                      help='render pages in this many processes (0: one per '
+                      'CPU)')
+  parser.add_argument('--cache', metavar='DIR',
+                      help='keep rendered pdf pages in DIR and only re-render '
+                      'pages whose cards or style changed')
+  parser.add_argument('--inline-faces', action='store_true',
+                      help='draw every card face in full instead of '
+                      'referencing shared half faces')
+  return parser
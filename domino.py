@@ -1,30 +1,10 @@
 #!/opt/homebrew/bin/python3
 
 import itertools
-from math import pi, floor, atan2
+from math import pi, atan2
 import cairo
-from PyPDF2 import PdfFileMerger, PdfFileReader
-import os
-
-
-class Color:
-  def __init__(self, r, g, b, a=1):
-    self.r = nrgb(r)
-    self.g = nrgb(g)
-    self.b = nrgb(b)
-    self.a = a
-
-
-def set_color(ctx: cairo.Context, color):
-  ctx.set_source_rgba(color.r, color.g, color.b, color.a)
-
-
-def ppi(inches):
-  return int(inches * 72)
-
-
-def nrgb(raw: int):
-  return float(raw) / 255
+import cardsheet
+from cardsheet import Color, ppi, set_color
 
 
 def combinations_two(start, end, contain_self=False, repeat=1):
@@ -46,15 +26,14 @@ CARD_HEIGHT = ppi(3.5)
 
 CARD_OUTLINE_WIDTH = 12
 
+# Cards are drawn as if in the bottom left slot of this sheet; the imposed
+# layout then moves each one to its place on the real paper.
 PAPER_WIDTH = ppi(11)
 PAPER_HEIGHT = ppi(8.5)
 
 MARGIN_WIDTH = ppi(0.5)
 MARGIN_HEIGHT = ppi(0.5)
 
-MAX_COLS = floor((PAPER_WIDTH - MARGIN_WIDTH*2)/CARD_WIDTH)
-MAX_ROWS = floor((PAPER_HEIGHT - MARGIN_HEIGHT*2)/CARD_HEIGHT)
-
 MAJOR_FONT_SIZE = 70
 MAJOR_EXTRA_SHIFT = 20
 MAJOR_EXTRA_SHIFT_Y = 45
@@ -73,6 +52,16 @@ def yinv(yin: int):
   return PAPER_HEIGHT - yin
 
 
+# card in slot (0, 0)
+CARD_RECT = (MARGIN_WIDTH, yinv(MARGIN_HEIGHT + CARD_HEIGHT),
+             CARD_WIDTH, CARD_HEIGHT)
+# the same, with room for strokes that overhang its edges
+CARD_EXTENTS = (MARGIN_WIDTH - CARD_OUTLINE_WIDTH,
+                yinv(MARGIN_HEIGHT + CARD_HEIGHT) - CARD_OUTLINE_WIDTH,
+                CARD_WIDTH + CARD_OUTLINE_WIDTH*2,
+                CARD_HEIGHT + CARD_OUTLINE_WIDTH*2)
+
+
 MAIN_TEXT_COLOR = Color(5, 45, 74, 0.25)
 BOX_COLOR = Color(5, 26, 52)
 OUTLINE_COLOR = Color(255, 255, 255)
@@ -94,6 +83,9 @@ BACK_TRI_RIGHT = Color(55, 55, 55)
 BACK_FONT_COLOR = Color(0, 0, 0)
 BACK_LINE_WIDTH = 1
 
+def number_color(value: int):
+  return cardsheet.number_color(NUMBER_COLORS, value)
+
 
 def rot_card(ctx: cairo.Context, xi, yi, angle=pi, inv=False):
   if inv:
@@ -125,9 +117,6 @@ def triangle(ctx: cairo.Context, xi: int, yi: int, color: Color):
 
 
 def draw_text(ctx: cairo.Context, main: bool, s, xi: int, yi: int):
-  ctx.select_font_face(FONT, cairo.FONT_SLANT_NORMAL,
-                       cairo.FONT_WEIGHT_BOLD)
-
   s_orig = s
   extra_shift_minor_y = 0
 
@@ -143,27 +132,30 @@ def draw_text(ctx: cairo.Context, main: bool, s, xi: int, yi: int):
     extra_shift_minor = 0
   if main:
     color = MAIN_TEXT_COLOR
-    font_size = MAJOR_FONT_SIZE
-    ctx.set_font_size(font_size)
+    # as wide as fits between the card outline and the centring below
+    extents, path = cardsheet.number_layout(
+        ctx, FONT, MAJOR_FONT_SIZE, s,
+        1.5 * (BOX_TOTAL_WIDTH / 2 + extra_shift_major - CARD_OUTLINE_WIDTH))
     xm = MARGIN_WIDTH + (BOX_TOTAL_WIDTH / 2) - \
-        (ctx.text_extents(s).width / 1.5) + extra_shift_major + CARD_WIDTH*xi
+        (extents.width / 1.5) + extra_shift_major + CARD_WIDTH*xi
     ym = yinv(MARGIN_HEIGHT + CARD_HEIGHT*(yi + 1) -
               MAJOR_FONT_SIZE - BOX_RADIUS*2 - MAJOR_EXTRA_SHIFT_Y)
     line_width = 0
   else:
-    color = NUMBER_COLORS[int(s_orig, 16)]
-    font_size = MINOR_FONT_SIZE
-    ctx.set_font_size(font_size)
+    color = number_color(int(s_orig))
+    # right-aligned in the badge, clear of the card outline
+    extents, path = cardsheet.number_layout(
+        ctx, FONT, MINOR_FONT_SIZE, s,
+        BOX_TOTAL_WIDTH - 16 - CARD_OUTLINE_WIDTH)
     adj = BOX_RADIUS - \
-        (2*BOX_RADIUS - ctx.text_extents(s).height) / 2 - extra_shift_minor_y
+        (2*BOX_RADIUS - extents.height) / 2 - extra_shift_minor_y
     xm = MARGIN_WIDTH + (BOX_TOTAL_WIDTH) - 16 - \
-        ctx.text_extents(s).width + CARD_WIDTH*xi - extra_shift_minor
+        extents.width + CARD_WIDTH*xi - extra_shift_minor
     ym = yinv(MARGIN_HEIGHT + CARD_HEIGHT*(yi + 1) -
               BOX_RADIUS - adj - BOX_EXTRA_Y)
     line_width = 0.8
 
-  ctx.move_to(xm, ym)
-  ctx.text_path(s)
+  cardsheet.text_path(ctx, path, xm, ym)
 
   # set text fill color, fill in the text, preserve so we can draw the outline
   set_color(ctx, color)
@@ -178,19 +170,17 @@ def draw_text(ctx: cairo.Context, main: bool, s, xi: int, yi: int):
 def draw_back_text(ctx: cairo.Context, s: str, xi: int, yi: int):
 
   ctx.save()
-  ctx.select_font_face(FONT, cairo.FONT_SLANT_NORMAL,
-                       cairo.FONT_WEIGHT_BOLD)
-  ctx.set_font_size(BACK_FONT_SIZE)
+  extents, path = cardsheet.text_layout(ctx, FONT, BACK_FONT_SIZE, s)
 
   xshift = MARGIN_WIDTH + \
-      (CARD_WIDTH + ctx.text_extents(s).height) / \
+      (CARD_WIDTH + extents.height) / \
       2 - CARD_WIDTH/2 + CARD_WIDTH * xi
   yshift = yinv(MARGIN_HEIGHT + (CARD_HEIGHT +
-                ctx.text_extents(s).width)/2 - 20 + CARD_HEIGHT * yi)
+                extents.width)/2 - 20 + CARD_HEIGHT * yi)
   ctx.translate(xshift, yshift)
   ctx.rotate(atan2(CARD_HEIGHT, CARD_WIDTH))
 
-  ctx.text_path(s)
+  ctx.append_path(path)
   # set text fill color, fill in the text, preserve so we can draw the outline
   set_color(ctx, BACK_FONT_COLOR)
   ctx.fill_preserve()
@@ -229,104 +219,29 @@ def draw_outline(ctx: cairo.Context, xi: int, yi: int, fill=False):
   ctx.stroke()
 
 
-def draw_cuts(ctx: cairo.Context):
-  set_color(ctx, CUTS_COLOR)
-  ctx.set_line_width(1)
+def draw_back(ctx: cairo.Context, xi: int, yi: int):
+  triangle(ctx, xi, yi, BACK_TRI_LEFT)
+  rot_card(ctx, xi, yi)
+  triangle(ctx, xi, yi, BACK_TRI_RIGHT)
+  rot_card(ctx, xi, yi)
+  draw_outline(ctx, xi, yi)
+  # draw_back_text(ctx, GAME_NAME, xi, yi)
 
-  for i in range(MAX_ROWS + 1):
-    # Left side
-    ctx.move_to(0, yinv(MARGIN_HEIGHT + CARD_HEIGHT*i))
-    ctx.rel_line_to(MARGIN_WIDTH/1.5, 0)
 
-    # Right side
-    ctx.move_to(PAPER_WIDTH, yinv(MARGIN_HEIGHT + CARD_HEIGHT*i))
-    ctx.rel_line_to(-MARGIN_WIDTH/1.5, 0)
-
-  for i in range(MAX_COLS + 1):
-    # Bottom side
-    ctx.move_to(MARGIN_WIDTH + CARD_WIDTH*i, yinv(0))
-    ctx.rel_line_to(0, -MARGIN_HEIGHT/1.5)
-
-    # Top side
-    ctx.move_to(MARGIN_WIDTH + CARD_WIDTH*i, 0)
-    ctx.rel_line_to(0, MARGIN_HEIGHT/1.5)
-
-  ctx.stroke()
+GAME = cardsheet.CardGame(
+    __name__, GAME_NAME, CARD_RECT, CARD_EXTENTS, CUTS_COLOR, number_color,
+    triangle, draw_text, draw_box, rot_card, draw_outline, draw_back,
+    key_extra=(blank_character,))
 
 
 if __name__ == '__main__':
-  xi = 0
-  yi = 0
-  file_idx = 0
-
-  for left, right in combinations_two(0, 7, contain_self=True, repeat=2):
-    if (xi == 0 and yi == 0):
-      if svg:
-        surface = cairo.SVGSurface(
-            'Scout-{}.svg'.format(file_idx), PAPER_WIDTH, PAPER_HEIGHT)
-        surface_back = cairo.SVGSurface(
-            'Scout-Back{}.svg'.format(file_idx), PAPER_WIDTH, PAPER_HEIGHT)
-      else:
-        surface = cairo.PDFSurface(
-            'Scout-{}.pdf'.format(file_idx), PAPER_WIDTH, PAPER_HEIGHT)
-        surface_back = cairo.PDFSurface(
-            'Scout-Back{}.pdf'.format(file_idx), PAPER_WIDTH, PAPER_HEIGHT)
-      file_idx += 1
-      ctx = cairo.Context(surface)
-      ctx_back = cairo.Context(surface_back)
-      draw_cuts(ctx)
-      draw_cuts(ctx_back)
-
-    lefts = str(left)
-    rights = str(right)
-
-    # Back Side
-    # "Flip along short edge"
-    xback = MAX_COLS - xi - 1
-    yback = yi
-    triangle(ctx_back, xback, yback, BACK_TRI_LEFT)
-    rot_card(ctx_back, xback, yback)
-    triangle(ctx_back, xback, yback, BACK_TRI_RIGHT)
-    rot_card(ctx_back, xback, yback)
-    draw_outline(ctx_back, xback, yback)
-    # draw_back_text(ctx_back, GAME_NAME, xback, yback)
-
-    # Front Left Side
-    triangle(ctx, xi, yi, NUMBER_COLORS[left])
-    draw_text(ctx, True, lefts, xi, yi)
-    draw_box(ctx, xi, yi)
-    draw_text(ctx, False, rights, xi, yi)
-
-    rot_card(ctx, xi, yi)
-
-    # Front Rigth Side
-    triangle(ctx, xi, yi, NUMBER_COLORS[right])
-    draw_text(ctx, True, rights, xi, yi)
-    draw_box(ctx, xi, yi)
-    draw_text(ctx, False, lefts, xi, yi)
-
-    rot_card(ctx, xi, yi)
-
-    draw_outline(ctx, xi, yi)
-
-    if xi < (MAX_COLS - 1):
-      xi += 1
-    elif yi < (MAX_ROWS - 1):
-      xi = 0
-      yi += 1
-    else:
-      xi = 0
-      yi = 0
-
-  surface.finish()
-  surface_back.finish()
-
-  if not svg:
-    # Finally, combine pages of PDF into one
-    combined = PdfFileMerger()
-    for i in range(0, file_idx):
-      combined.append(PdfFileReader('Scout-{}.pdf'.format(i), 'rb'))
-      os.remove('Scout-{}.pdf'.format(i))
-      combined.append(PdfFileReader('Scout-Back{}.pdf'.format(i), 'rb'))
-      os.remove('Scout-Back{}.pdf'.format(i))
-    combined.write("Domino-Cards.pdf")
+  parser = cardsheet.argument_parser('Domino-Cards.pdf',
+                                     'svg' if svg else 'pdf')
+  parser.add_argument('--double', type=int, default=6,
+                      help='highest value in the set, e.g. 12 for double-12')
+  parser.add_argument('--copies', type=int, default=2,
+                      help='copies of each tile in the deck')
+  args = parser.parse_args()
+
+  GAME.run(combinations_two(0, args.double + 1, contain_self=True,
+                            repeat=args.copies), args)
@@ -1,12 +1,12 @@
 #!/opt/homebrew/bin/python3
 
+import argparse
+import heapq
 import itertools
-
-
-def combinations(l1, l2):
-  for i in range(len(l1)):
-    for j in range(len(l2)):
-      yield (l1[i], l2[j])
+import json
+import math
+from multiprocessing import Pool
+import numpy as np
 
 
 deck1 = [['A', [1, 2, 5, 6,  7,  9,  10, 11, 14, 15, 16, 18]],
@@ -17,28 +17,307 @@ deck2 = [['D', [1, 4, 9, 12, 14, 17, 19, 22, 27, 30, 32, 35]],
          ['E', [2, 5, 7, 10, 15, 18, 20, 23, 25, 28, 33, 36]],
          ['F', [3, 6, 8, 11, 13, 16, 21, 24, 26, 29, 31, 34]]]
 
-for deck in [deck1, deck2]:
-  stats = {}
-  for first, second in itertools.combinations(deck, 2):
-    first_name = first[0]
-    second_name = second[0]
-    combo = first_name + second_name
-
-    # init stats for this particular combo
-    stats[combo] = {}
-    stats[combo]['win'] = 0
-    stats[combo]['lose'] = 0
-    stats[combo]['tie'] = 0
-    stats[combo]['total'] = 0
-
-    for a, b in combinations(first[1], second[1]):
-      if a > b:
-        stats[combo]['win'] += 1
-      elif a == b:
-        stats[combo]['tie'] += 1
+
+def compare(faces, sorted_other):
+  # (win, tie, lose) counts of every face against every face of the other
+  # deck, which must be sorted: each face's losers and ties are found by
+  # binary search instead of pairing it with every other face
+  below = np.searchsorted(sorted_other, faces, side='left')
+  not_above = np.searchsorted(sorted_other, faces, side='right')
+  win = int(below.sum())
+  tie = int((not_above - below).sum())
+  return win, tie, len(faces) * len(sorted_other) - win - tie
+
+
+def dominance(decks):
+  # wins[i, j] and ties[i, j]: face pairs where deck i beats (ties) deck j,
+  # out of total[i, j]; each deck is sorted once
+  faces = [np.sort(np.asarray(deck[1])) for deck in decks]
+  wins = np.zeros((len(decks), len(decks)), dtype=np.int64)
+  ties = np.zeros_like(wins)
+  for i in range(len(decks)):
+    for j in range(i + 1, len(decks)):
+      wins[i, j], ties[i, j], wins[j, i] = compare(faces[i], faces[j])
+      ties[j, i] = ties[i, j]
+  sizes = np.array([len(deck_faces) for deck_faces in faces])
+  return wins, ties, np.outer(sizes, sizes)
+
+
+def cycles(beats):
+  # every cycle of the beats relation (beats[i, j]: deck i beats deck j),
+  # each once, starting from its lowest deck
+  def extend(path):
+    for deck in np.flatnonzero(beats[path[-1]]):
+      if deck == path[0] and len(path) > 2:
+        yield path
+      elif deck > path[0] and deck not in path:
+        yield from extend(path + [int(deck)])
+
+  for start in range(len(beats)):
+    yield from extend([start])
+
+
+def describe_cycles(names, probability, beats=None):
+  # each cycle with its weakest margin; beats defaults to the row deck's
+  # chance being higher, give it exactly where rounding could matter
+  if beats is None:
+    beats = probability - probability.T > 1e-12
+  described = []
+  for cycle in cycles(beats):
+    # the cycle is as strong as its closest matchup
+    margin = min(probability[i, j] - probability[j, i]
+                 for i, j in zip(cycle, cycle[1:] + cycle[:1]))
+    described.append('{} (weakest margin {:.3f})'.format(
+        ' > '.join(names[i] for i in cycle + cycle[:1]), margin))
+  return described
+
+
+def print_dominance(decks):
+  names = [deck[0] for deck in decks]
+  width = max(len(name) for name in names + ['0.000'])
+  wins, ties, total = dominance(decks)
+  probability = wins / total
+
+  # row deck's chance to beat the column deck
+  print(' ' * width, *(name.rjust(width) for name in names))
+  for i, name in enumerate(names):
+    print(name.rjust(width), *(
+        '-'.rjust(width) if i == j else
+        '{:.3f}'.format(probability[i, j]).rjust(width)
+        for j in range(len(names))))
+
+  for cycle in describe_cycles(names, probability, wins > wins.T) or [None]:
+    print('cycle: {}'.format(cycle) if cycle else 'no cycles')
+  if ties.any():
+    print('ties: {:.3f} of all matchups'.format(
+        ties.sum() / (total.sum() - np.trace(total))))
+
+
+# Multiple draws. Each player draws several faces, each from their whole
+# deck (as a die would), and the higher total wins. The chances of every
+# total are the deck's face chances convolved with themselves once per draw.
+
+def convolve(first, second):
+  # FFT once both are long enough for it to beat direct convolution
+  if min(len(first), len(second)) < 500:
+    return np.convolve(first, second)
+  size = len(first) + len(second) - 1
+  product = np.fft.irfft(np.fft.rfft(first, size) * np.fft.rfft(second, size),
+                         size)
+  return np.maximum(product, 0)
+
+
+def sum_chances(faces, draws):
+  # (lowest total, chance of each total from there) of draws faces, by
+  # repeated squaring: log2(draws) convolutions instead of draws
+  faces = np.asarray(faces).astype(np.int64)
+  low = int(faces.min())
+  power = np.bincount(faces - low) / len(faces)
+  chances = np.ones(1)
+  remaining = draws
+  while remaining:
+    if remaining & 1:
+      chances = convolve(chances, power)
+    remaining >>= 1
+    if remaining:
+      power = convolve(power, power)
+  return low * draws, chances
+
+
+def draw_matrix(decks, draws):
+  # wins[i, j] and ties[i, j]: chance that deck i's total beats (ties)
+  # deck j's
+  totals = [sum_chances(deck[1], draws) for deck in decks]
+  start = min(low for low, _ in totals)
+  end = max(low + len(chances) for low, chances in totals)
+  padded = np.zeros((len(decks), end - start))
+  for row, (low, chances) in zip(padded, totals):
+    row[low - start:low - start + len(chances)] = chances
+  # chance of a total below each value
+  below = np.cumsum(padded, axis=1) - padded
+  return padded @ below.T, padded @ padded.T
+
+
+def best_of(wins, losses, rounds):
+  # chance of winning the most of rounds (odd) rounds, tied rounds being
+  # played again
+  with np.errstate(divide='ignore', invalid='ignore'):
+    chance = np.nan_to_num(wins / (wins + losses), nan=0.5)
+  return sum(math.comb(rounds, won) * chance ** won *
+             (1 - chance) ** (rounds - won)
+             for won in range(rounds // 2 + 1, rounds + 1))
+
+
+def print_draws(decks, draws, rounds=1):
+  # how the cycles change as each player draws more faces
+  names = [deck[0] for deck in decks]
+  for count in range(1, draws + 1):
+    wins, _ = draw_matrix(decks, count)
+    if rounds > 1:
+      wins = best_of(wins, wins.T, rounds)
+    print('{} draw{}{}: {}'.format(
+        count, 's' if count > 1 else '',
+        ', best of {}'.format(rounds) if rounds > 1 else '',
+        '; '.join(describe_cycles(names, wins)) or 'no cycles'))
+
+
+# Design search. Faces 1..n are split into k decks of n / k faces, and a
+# design is one where deck 0 beats deck 1, 1 beats 2, ... and the last beats
+# deck 0, each by at least the margin. Faces are placed from n down, so a
+# face placed in a deck loses to every face already placed in the others
+# and beats every face placed after it: win counts are exact as they go, and
+# each deck's wins against the next can grow by at most (its size) for every
+# face the next deck still has to take.
+
+def required_wins(size, margin):
+  # face pairs a deck must win against the next one to beat it by margin
+  pairs = size * size
+  return max(pairs // 2 + 1, math.ceil((1 + margin) * pairs / 2 - 1e-9))
+
+
+def search_designs(n, k, required, best=None, prefix=()):
+  # (score, decks) of the designs whose largest faces are placed as in
+  # prefix (the deck of n, of n - 1, ...), where score is the fewest pair
+  # wins of any deck against the next. With best, only that many of the
+  # highest scores are kept, and branches that cannot reach them are cut.
+  size = n // k
+  faces = [[] for _ in range(k)]
+  wins = [[0] * k for _ in range(k)]
+  designs = []
+
+  def place(number, deck):
+    for other in range(k):
+      wins[other][deck] += len(faces[other])
+    faces[deck].append(number)
+
+  def unplace(deck):
+    faces[deck].pop()
+    for other in range(k):
+      wins[other][deck] -= len(faces[other])
+
+  def feasible():
+    need = required
+    if best and len(designs) == best:
+      need = max(need, designs[0][0])
+    return all(wins[i][(i + 1) % k] + size * (size - len(faces[(i + 1) % k]))
+               >= need for i in range(k))
+
+  def extend(number):
+    if number == 0:
+      design = (min(wins[i][(i + 1) % k] for i in range(k)),
+                tuple(tuple(reversed(deck)) for deck in faces))
+      if best is None:
+        designs.append(design)
+      elif len(designs) < best:
+        heapq.heappush(designs, design)
       else:
-        stats[combo]['lose'] += 1
-      stats[combo]['total'] += 1
-    
+        heapq.heappushpop(designs, design)
+      return
+    for deck in range(k):
+      if len(faces[deck]) < size:
+        place(number, deck)
+        if feasible():
+          extend(number - 1)
+        unplace(deck)
+
+  for number, deck in zip(range(n, 0, -1), prefix):
+    place(number, deck)
+  if feasible():
+    extend(n - len(prefix))
+  return sorted(designs, key=lambda design: -design[0])
+
+
+def prefixes(n, k, depth):
+  # every way to place the largest depth faces; n always goes in deck 0, as
+  # rotating the decks around the cycle gives the same design
+  size = n // k
+  for rest in itertools.product(range(k), repeat=depth - 1):
+    prefix = (0,) + rest
+    if max(prefix.count(deck) for deck in range(k)) <= size:
+      yield prefix
+
+
+def search(n, k, margin, best=None, workers=1, depth=6):
+  # search_designs over a process pool, one job per prefix; merged in prefix
+  # order so the result does not depend on the number of workers
+  required = required_wins(n // k, margin)
+  jobs = [(n, k, required, best, prefix)
+          for prefix in prefixes(n, k, min(depth, n))]
+  if workers == 1:
+    results = itertools.starmap(search_designs, jobs)
+  else:
+    with Pool(workers) as pool:
+      results = pool.starmap(search_designs, jobs)
+  designs = [design for result in results for design in result]
+  designs.sort(key=lambda design: -design[0])
+  return designs[:best] if best else designs
+
+
+def print_designs(n, k, designs):
+  size = n // k
+  names = [chr(ord('A') + i) for i in range(k)]
+  for score, decks in designs:
+    print('{}  (weakest margin {:.3f})'.format(
+        ' | '.join('{}: {}'.format(name, ' '.join(map(str, deck)))
+                   for name, deck in zip(names, decks)),
+        (2 * score - size * size) / (size * size)))
+  print('{} designs'.format(len(designs)))
+  if designs:
+    print()
+    print_dominance([[name, list(deck)]
+                     for name, deck in zip(names, designs[0][1])])
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--decks',
+                      help='JSON file of {"name": [faces...]} to compare '
+                      'instead of the built-in decks')
+  parser.add_argument('--search', nargs=2, type=int, metavar=('N', 'K'),
+                      help='search for ways to split faces 1..N into K equal '
+                      'decks that beat each other in a cycle')
+  parser.add_argument('--margin', type=float, default=0.0,
+                      help='least chance by which every deck must beat the '
+                      'next, over the chance that it loses')
+  parser.add_argument('--best', type=int,
+                      help='keep only this many designs with the widest '
+                      'weakest margin (default: every design)')
+  parser.add_argument('--workers', type=int, default=1,
+                      help='search over this many processes (0: one per CPU)')
+  parser.add_argument('--draws', type=int,
+                      help='also show the cycles when each player draws up '
+                      'to this many faces (each from a full deck) and sums '
+                      'them')
+  parser.add_argument('--best-of', type=int, default=1,
+                      help='with --draws, play this many rounds (odd) and '
+                      'win the most of them')
+  args = parser.parse_args()
+  if args.best_of < 1 or args.best_of % 2 == 0:
+    parser.error('--best-of must be odd')
+  if args.workers < 0:
+    parser.error('--workers must be 0 or more')
+
+  if args.search:
+    n, k = args.search
+    if k < 3 or n % k:
+      parser.error('--search needs at least 3 decks that split N evenly')
+    print_designs(n, k, search(n, k, args.margin, args.best,
+                               args.workers or None))
+  else:
+    if args.decks:
+      with open(args.decks) as decks_file:
+        deck_sets = [list(map(list, json.load(decks_file).items()))]
+    else:
+      deck_sets = [deck1, deck2]
+
+    # sums are counted in a bin per total, so drawing needs whole faces
+    if args.draws and not all(float(face).is_integer()
+                              for decks in deck_sets
+                              for _, faces in decks for face in faces):
+      parser.error('--draws needs whole-number faces')
 
-  print(stats)
+    for decks in deck_sets:
+      print_dominance(decks)
+      if args.draws:
+        print_draws(decks, args.draws, args.best_of)
+      print()
@@ -1,13 +1,44 @@
 #!/opt/homebrew/opt/python@3.9/libexec/bin/python3
 
+import argparse
+from collections import Counter
+import contextlib
+import csv
 from enum import Enum, auto, unique
+import hashlib
 import itertools
-import matplotlib.pyplot as plt
+import json
+import math
+from multiprocessing import Pool
+import numpy as np
+import os
+import sys
+import time
 
 
-LONGEST_NAME_FLOWER = 13
 LONGEST_NAME_COLOR = 6
 
+# the base game's cards and rules
+DECK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'tussie-cards.json')
+
+# results of earlier runs, by cards and options; bump the version whenever a
+# change to the scoring would change the results
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'tussie-analyze')
+CACHE_VERSION = 1
+
+# cards in a hand; hands with the short-hand card (Marigold) have one fewer
+HAND_SIZE = 4
+
+# sampling: hands drawn per batch, and the normal quantile of the
+# confidence intervals (95%)
+SAMPLE_BATCH = 16384
+CONFIDENCE_Z = 1.96
+
+# arrangements (or, for the exact engine, combinations) scored together by
+# the numpy engines
+BATCH_SIZE = 4096
+
 
 @unique
 class Color(Enum):
@@ -19,13 +50,198 @@ class Color(Enum):
 
 
 class Card:
-  def __init__(self, name, color: Color, hearts, scoring):
+  # positional: the scoring looks at the card's position or neighbours, not
+  # just at which cards (and keepsakes) are in the hand
+  # wildcard: the card counts as whichever colour scores best (Orchid)
+  # short_hand: hands with the card have one card fewer (Marigold)
+  # Scoring that looks at colours must come from color_scoring, so the
+  # wildcard colours can be chosen from colour counts alone.
+  def __init__(self, name, color: Color, hearts, scoring, positional=False,
+               wildcard=False, short_hand=False):
     self.name = name
     self.color = color
     self.hearts = hearts
     self.keepsake = False
     self.position = 0
     self.scoring = scoring
+    self.positional = positional
+    self.wildcard = wildcard
+    self.short_hand = short_hand
+    self.color_points = getattr(scoring, 'color_points', None)
+
+
+def color_scoring(points):
+  # scoring from the number of cards of each colour in the hand
+  def scoring(cards, _):
+    return points(Counter(card.color for card in cards))
+  scoring.color_points = points
+  return scoring
+
+
+def best_colors(cards: list[Card]):
+  # Colour-dependent points of the hand with its wildcards coloured to score
+  # the most, and those colours in wildcard order. Only the colour counts
+  # matter, so each multiset of wildcard colours is tried once: 5 for one
+  # wildcard, 15 for two, 35 for three. The first best wins a tie.
+  counts = Counter(card.color for card in cards if not card.wildcard)
+  scorers = [card.color_points for card in cards if card.color_points]
+  wildcards = sum(card.wildcard for card in cards)
+  max_points = None
+  for colors in itertools.combinations_with_replacement(Color, wildcards):
+    trial = counts.copy()
+    trial.update(colors)
+    points = sum(scorer(trial) for scorer in scorers)
+    if max_points is None or points > max_points:
+      max_points = points
+      max_colors = colors
+  return max_points, max_colors
+
+
+class ScoreMemo:
+  # Order-independent part of a hand's score (hearts plus every
+  # non-positional scorer that does not look at colours), keyed by which
+  # cards are in the hand and which of them are keepsakes. Every ordering of
+  # the same hand shares one entry, so only the positional scorers are
+  # called again.
+  def __init__(self):
+    self.scores = {}
+    self.calls = 0
+    self.skipped = 0
+
+  def start(self, arrangement: list[Card]):
+    # per arrangement: keepsake maps are read in a canonical (name) order of
+    # the cards, so every ordering of the hand gives the same keys
+    self.order = sorted(range(len(arrangement)),
+                        key=lambda i: arrangement[i].name)
+    hand = tuple(arrangement[i].name for i in self.order)
+    self.hand_scores = self.scores.setdefault(hand, {})
+    self.hearts = sum(card.hearts for card in arrangement)
+    self.independent = [card for card in arrangement
+                        if not card.positional and not card.color_points]
+    self.positional = [card for card in arrangement if card.positional]
+
+  def points(self, cards: list[Card], keepsake_map):
+    key = tuple([keepsake_map[i] for i in self.order])
+    points = self.hand_scores.get(key)
+    if points is None:
+      points = self.hand_scores[key] = self.hearts + sum(
+          [card.scoring(cards, card.position) for card in self.independent])
+      self.calls += len(self.independent)
+    else:
+      self.skipped += len(self.independent)
+    for card in self.positional:
+      points += card.scoring(cards, card.position)
+    self.calls += len(self.positional)
+    return points
+
+
+# phase that HandTerms charges for computing the terms kernels share
+SHARED_TERMS = "shared terms"
+
+
+class Profile:
+  # Calls, seconds and net allocated memory blocks per card scorer (Card
+  # scoring, colour points and numpy kernels, under the card's name), and
+  # calls and seconds per analysis phase. Only instrumented cards and
+  # kernels are measured, so an analysis without a Profile pays nothing.
+  # Net blocks are allocations minus frees over the calls, so a scorer that
+  # frees more than it keeps (dropping a cached array) goes negative. A
+  # kernel's seconds leave out the HandTerms it computes on first use; those
+  # are charged to the SHARED_TERMS phase instead, whichever kernel asks.
+  def __init__(self):
+    self.scorers = {}
+    self.phases = {}
+    # blocks that measuring a call allocates by itself, taken off every call
+    self.block_overhead = 0
+    measured = self.timed(None, no_scoring)
+    for _ in range(100):
+      measured()
+    self.block_overhead = round(self.scorers.pop(None)[2] / 100)
+
+  def timed(self, name, function):
+    # counting blocks walks the allocator, so it stays outside the timing
+    entry = self.scorers.setdefault(name, [0, 0.0, 0])
+    block_overhead = self.block_overhead
+
+    def timed_function(*args):
+      blocks = sys.getallocatedblocks()
+      shared = self.shared_seconds()
+      start = time.perf_counter()
+      result = function(*args)
+      seconds = time.perf_counter() - start
+      entry[2] += sys.getallocatedblocks() - blocks - block_overhead
+      entry[1] += seconds - (self.shared_seconds() - shared)
+      entry[0] += 1
+      return result
+    return timed_function
+
+  def shared_seconds(self):
+    return self.phases.get(SHARED_TERMS, (0, 0.0))[1]
+
+  def instrument(self, cards: list[Card], kernels=None):
+    for card in cards:
+      if card.scoring is not no_scoring:
+        card.scoring = self.timed(card.name, card.scoring)
+      if card.color_points:
+        card.color_points = self.timed(card.name, card.color_points)
+    return {name: self.timed(name, kernel)
+            for name, kernel in (kernels or {}).items()}
+
+  @contextlib.contextmanager
+  def phase(self, name):
+    start = time.perf_counter()
+    yield
+    entry = self.phases.setdefault(name, [0, 0.0])
+    entry[0] += 1
+    entry[1] += time.perf_counter() - start
+
+  def merge(self, other):
+    for mine, theirs in ((self.scorers, other.scorers),
+                         (self.phases, other.phases)):
+      for name, entry in theirs.items():
+        mine[name] = [a + b for a, b in zip(mine.get(name, [0] * len(entry)),
+                                            entry)]
+
+  def print_table(self, longest_name):
+    # slowest first
+    longest_name = max([longest_name] + [len(name) for name in self.phases])
+    print("{} {:>10} {:>9} {:>9} {:>10}".format(
+        "scorer".ljust(longest_name), "calls", "seconds", "us/call",
+        "net blocks"))
+    for name, (calls, seconds, blocks) in sorted(
+        self.scorers.items(), key=lambda item: -item[1][1]):
+      print("{} {:>10} {:>9.3f} {:>9.2f} {:>10}".format(
+          name.ljust(longest_name), calls, seconds,
+          seconds / max(calls, 1) * 1e6,
+          blocks))
+    print("{} {:>10} {:>9}".format("phase".ljust(longest_name), "calls",
+                                   "seconds"))
+    for name, (calls, seconds) in sorted(self.phases.items(),
+                                         key=lambda item: -item[1][1]):
+      print("{} {:>10} {:>9.3f}".format(name.ljust(longest_name), calls,
+                                        seconds))
+    if SHARED_TERMS in self.phases:
+      print("(kernel seconds leave out {}, which is part of scoring)".format(
+          SHARED_TERMS))
+
+  def dump(self, path):
+    with open(path, 'w') as profile_file:
+      json.dump({
+          'scorers': {name: {'calls': calls, 'seconds': seconds,
+                             'net_blocks': blocks}
+                      for name, (calls, seconds, blocks)
+                      in self.scorers.items()},
+          'phases': {name: {'calls': calls, 'seconds': seconds}
+                     for name, (calls, seconds) in self.phases.items()},
+          'notes': {'net_blocks': 'allocated minus freed memory blocks',
+                    'seconds': 'kernels leave out {}, part of the scoring '
+                               'phase'.format(SHARED_TERMS)},
+      }, profile_file, indent=2)
+
+
+def phase(profile: Profile, name):
+  # profile.phase(name), or nothing without a profile
+  return profile.phase(name) if profile else contextlib.nullcontext()
 
 
 def get_adjacent(cards: list[Card], position):
@@ -41,10 +257,6 @@ def get_adjacent(cards: list[Card], position):
   return adjacent
 
 
-def cards_of_a_color(cards: list[Card], color: Color):
-  return sum(1 for card in cards if card.color == color)
-
-
 def display_arrangement(cards: list[Card], points):
   for card in cards:
     print("{}({})({})".format(
@@ -56,130 +268,1002 @@ def no_scoring(*_):
   return 0
 
 
-def calculate_points(cards: list[Card]):
+def colorless_points(cards: list[Card]):
+  # hearts plus every scorer that does not look at colours; best_colors
+  # adds the rest
   points = 0
   points += sum(card.hearts for card in cards)
-  points += sum(card.scoring(cards, card.position) for card in cards)
+  points += sum(card.scoring(cards, card.position) for card in cards
+                if not card.color_points)
   return points
 
 
-all_points = []
-all_arrangements = []
+def analyze_arrangement(arrangement: list[Card], flower_stats, color_stats,
+                        histogram, memo: ScoreMemo = None,
+                        profile: Profile = None):
+  # Scores every keepsake map and folds them into the stats straight away;
+  # nothing is kept, so the arrangement's Cards can be reused by the next one.
+  if memo:
+    memo.start(arrangement)
+  # colour points depend on neither order nor keepsakes, so the wildcards
+  # are coloured once for every keepsake map
+  with phase(profile, "wildcard colours"):
+    color_points, colors = best_colors(arrangement)
+    wildcards = [card for card in arrangement if card.wildcard]
+    for card, color in zip(wildcards, colors):
+      card.color = color
+  length = len(arrangement)
+  all_points = []
+  with phase(profile, "keepsake maps"):
+    for keepsake_map in itertools.product([False, True], repeat=length):
+      for i in range(length):
+        arrangement[i].position = i
+        arrangement[i].keepsake = keepsake_map[i]
+      if memo:
+        max_points = memo.points(arrangement, keepsake_map) + color_points
+      else:
+        max_points = colorless_points(arrangement) + color_points
+      all_points.append(max_points)
+      # display_arrangement(arrangement, max_points)
 
+  # every keepsake map has the same flowers and colours, so they take one
+  # update for the whole arrangement
+  with phase(profile, "stats"):
+    summary = [len(all_points), sum(all_points), max(all_points),
+               min(all_points)]
+    for flower in arrangement:
+      merge_stats(flower_stats, {flower.name: summary})
+      merge_stats(color_stats, {flower.color.name: summary})
+    update_histogram(histogram, Counter(all_points))
 
-def analyze_arrangement(arrangement: list[Card]):
-  length = len(arrangement)
-  for keepsake_map in itertools.product([False, True], repeat=length):
-    for i in range(length):
-      arrangement[i].position = i
-      arrangement[i].keepsake = keepsake_map[i]
-    try:
-      orchid_index = [card.name for card in arrangement].index("Orchid")
-      max_points = 0
-      max_arrangement = []
-      for color in Color:
-        arrangement[orchid_index].color = color
-        points = calculate_points(arrangement)
-        if points > max_points:
-          max_points = points
-          max_arrangement = arrangement
-    except ValueError:
-      max_points = calculate_points(arrangement)
-      max_arrangement = arrangement
-    all_points.append(max_points)
-    all_arrangements.append([max_arrangement, max_points])
-    # display_arrangement(max_arrangement, max_points)
-
-
-def update_stats(stats, field_name, points):
-  try:
-    stats[field_name][0] += 1
-    stats[field_name][1] += points
-    stats[field_name][2] = max(stats[field_name][2], points)
-    stats[field_name][3] = min(stats[field_name][3], points)
 
-  except KeyError:
-    stats[field_name] = [1, points, points, points]
+def update_histogram(histogram, counts):
+  # one bin per score; the number of bins is bounded by the score range, not
+  # by how many hands are scored
+  for points, count in counts.items():
+    histogram[points] = histogram.get(points, 0) + count
 
 
-def compute_and_print_stats(stats, longest_name):
+def compute_and_print_stats(stats, longest_name, errors=None):
   list_stats = list(stats.items())
   list_stats.sort(key=lambda stat: stat[1][1] / stat[1][0])
 
   for field_name, stats in list_stats:
     print("{}:\t{} max\t{} min\t{:.2f} avg".format(field_name + " " *
-          (longest_name - len(field_name)), stats[2], stats[3], stats[1]/stats[0]))
+          (longest_name - len(field_name)), stats[2], stats[3], stats[1]/stats[0]),
+          end="")
+    print(" \u00b1 {:.3f}".format(errors[field_name]) if errors else "")
 
 
-if __name__ == "__main__":
-  cards = [
-      Card("Hyacinth", Color.PURPLE, 0, lambda cards, _: 3 if sum(
-          card.hearts for card in cards) == 0 else 0),
-      Card("Honeysuckle", Color.YELLOW, 1, lambda cards, position: sum(
-          not card.keepsake for card in get_adjacent(cards, position))),
-      Card("Forget-Me-Not", Color.PURPLE, 1, lambda cards,
-           position: sum(card.hearts for card in get_adjacent(cards, position))),
-      Card("Carnation", Color.YELLOW, 0, lambda cards, _: len(
-          {card.color for card in cards})),
-      Card("Peony", Color.PINK, 1, lambda cards, _: 2 if sum(
-          not card.keepsake for card in cards) == 2 else 0),
-      Card("Red Rose", Color.RED, 0, lambda cards,
-           _: sum(card.hearts for card in cards)),
-      Card("Gardenia", Color.WHITE, 0, lambda cards,
-           _: sum(card.keepsake for card in cards)),
-      Card("Amaryllis", Color.RED, 0, lambda cards,
-           _: sum(not card.keepsake for card in cards)),
-      Card("Pink Rose", Color.PINK, 0,
-           lambda cards, _: cards_of_a_color(cards, Color.PINK)),
-      Card("Red Tupid", Color.RED, 0,
-           lambda cards, _: cards_of_a_color(cards, Color.RED)),
-      Card("Violet", Color.PURPLE, 0,
-           lambda cards, _: cards_of_a_color(cards, Color.PURPLE)),
-      Card("Daisy", Color.WHITE, 0, lambda cards, _: sum(
-          1 for card in cards if card.hearts == 0) - 1),
-      Card("Camellia", Color.RED, 1, no_scoring),
-      Card("Phlox", Color.PINK, 2, no_scoring),
-      Card("Orchid", Color.WHITE, 1, no_scoring),
-      Card("Pink Larkspur", Color.PINK, 0, no_scoring),
-      Card("Snapdragon", Color.PURPLE, 1, no_scoring),
-      Card("Marigold", Color.YELLOW, 3, no_scoring)
-  ]
-
-  # NOTE: this assumes that "Marigold" is the last Card in the list.
-  # "Marigold" arrangements are only 3 cards in length, so need this special case.
-  for comb in itertools.combinations(cards[0:-1], 2):
-    lcomb = list(comb)
-    lcomb.append(cards[-1])
-    for tup_arrangement in itertools.permutations(lcomb):
-      arrangement = list(tup_arrangement)
-      analyze_arrangement(arrangement)
-
-  for tup_arrangement in itertools.permutations(cards[0:-1], 4):
-    arrangement = list(tup_arrangement)
-    analyze_arrangement(arrangement)
+def split_short_hand(cards: list[Card]):
+  # (the short-hand card or None, every other card in deck order)
+  short = [card for card in cards if card.short_hand]
+  return (short[0] if short else None,
+          [card for card in cards if not card.short_hand])
+
+
+def shards(cards: list[Card], hand_size=HAND_SIZE):
+  # Independent slices of the enumeration, (hand length, first card, short
+  # hand), in the order a single pass visits them. Hands with the short-hand
+  # card are one card shorter, so they get shards of their own.
+  short, others = split_short_hand(cards)
+  return ([(hand_size - 1, first, True)
+           for first in range(len(others)) if short] +
+          [(hand_size, first, False) for first in range(len(others))])
+
+
+def shard_combinations(cards: list[Card], shard):
+  # the shard's hands as unordered combinations, first card first
+  length, first, short_hand = shard
+  short, others = split_short_hand(cards)
+  if short_hand:
+    for rest in itertools.combinations(others[first + 1:], length - 2):
+      yield [others[first], *rest, short]
+  else:
+    for rest in itertools.combinations(others[first + 1:], length - 1):
+      yield [others[first], *rest]
+
+
+def shard_arrangements(cards: list[Card], shard):
+  length, first, short_hand = shard
+  _, others = split_short_hand(cards)
+  if short_hand:
+    # combinations(others, length - 1) whose first card is others[first],
+    # plus the short-hand card
+    for hand in shard_combinations(cards, shard):
+      for tup_arrangement in itertools.permutations(hand):
+        yield list(tup_arrangement)
+  else:
+    # permutations(others, length) starting with others[first]
+    rest = others[:first] + others[first + 1:]
+    for tup_arrangement in itertools.permutations(rest, length - 1):
+      yield [others[first]] + list(tup_arrangement)
+
+
+def arrangements(cards: list[Card], hand_size=HAND_SIZE):
+  for shard in shards(cards, hand_size):
+    yield from shard_arrangements(cards, shard)
+
+
+def merge_stats(stats, partial):
+  # fold one shard's stats into the total; new fields keep their order of
+  # first appearance
+  for field_name, (count, total, most, least) in partial.items():
+    try:
+      old = stats[field_name]
+      stats[field_name] = [old[0] + count, old[1] + total,
+                           max(old[2], most), min(old[3], least)]
+    except KeyError:
+      stats[field_name] = [count, total, most, least]
+
+
+# Vectorized scoring. A batch of hands is a set of equally shaped integer
+# arrays with one row per (arrangement, keepsake map): card ids (index into
+# the card list), colour values, hearts and keepsake bits. A kernel scores
+# one card for every row at once from the batch's HandTerms and returns
+# either one score per row (shape (rows, 1)) or one per position (shape
+# (rows, length)).
+
+class HandTerms:
+  # The rule terms of a batch, each computed once however many kernels use
+  # it: values() per position, total() per row (shape (rows, 1)). With a
+  # profile, computing them is timed as the SHARED_TERMS phase.
+  def __init__(self, colors, hearts, keepsake, profile: Profile = None):
+    self.colors = colors
+    self.hearts = hearts
+    self.keepsake = keepsake
+    self.profile = profile
+    self.computing = False
+    self.cached_values = {}
+    self.cached_totals = {}
+
+  def compute(self, function, term):
+    # terms built from other terms are timed once, at the outermost
+    if self.computing:
+      return function(term)
+    self.computing = True
+    try:
+      with phase(self.profile, SHARED_TERMS):
+        return function(term)
+    finally:
+      self.computing = False
+
+  def values(self, term):
+    try:
+      return self.cached_values[term]
+    except KeyError:
+      values = self.cached_values[term] = self.compute(self.new_values, term)
+      return values
+
+  def new_values(self, term):
+    if term in Color.__members__:
+      return self.colors == Color[term].value
+    return ARRAY_TERMS[term](self.colors, self.hearts, self.keepsake)
+
+  def total(self, term):
+    try:
+      return self.cached_totals[term]
+    except KeyError:
+      total = self.cached_totals[term] = self.compute(self.new_total, term)
+      return total
+
+  def new_total(self, term):
+    if term == "colors":
+      return sum(self.total(color.name) > 0 for color in Color)
+    return self.values(term).sum(axis=1, keepdims=True)
+
+
+def count_adjacent(values):
+  adjacent = np.zeros_like(values, dtype=int)
+  adjacent[:, 1:] += values[:, :-1]
+  adjacent[:, :-1] += values[:, 1:]
+  return adjacent
+
+
+def keepsake_maps(length):
+  # same order as itertools.product([False, True], repeat=length)
+  return np.array(list(itertools.product([False, True], repeat=length)))
+
+
+def vector_points(kernels, ids, terms: HandTerms, base=None):
+  # hearts (or the given base points) plus every kernel's score
+  points = (terms.total("hearts") if base is None else base).ravel().copy()
+  for card_id, kernel in kernels.items():
+    present = ids == card_id
+    if not present.any():
+      continue
+    points += (kernel(terms) * present).sum(axis=1)
+  return points
 
-  # Data plotting, analysis
 
+def vector_arrangements(cards: list[Card], kernels, arrangement_ids,
+                        profile: Profile = None):
+  # Score every arrangement under every keepsake map; rows come out in the
+  # same order as analyze_arrangement visits them.
+  maps = keepsake_maps(arrangement_ids.shape[1])
+  ids = np.repeat(arrangement_ids, len(maps), axis=0)
+  keepsake = np.tile(maps, (len(arrangement_ids), 1))
+  colors, points = vector_hands(cards, kernels, ids, keepsake, profile)
+  return ids, colors, keepsake, points
+
+
+def vector_hands(cards: list[Card], kernels, ids, keepsake,
+                 profile: Profile = None):
+  # colours (with the wildcards' best) and points of each row's hand
+  card_colors = np.array([card.color.value for card in cards])
+  card_hearts = np.array([card.hearts for card in cards])
+  colors = card_colors[ids]
+  hearts = card_hearts[ids]
+  colorless = {card_id: kernel for card_id, kernel in kernels.items()
+               if not cards[card_id].color_points}
+  colored = {card_id: kernel for card_id, kernel in kernels.items()
+             if cards[card_id].color_points}
+  points = vector_points(colorless, ids,
+                         HandTerms(colors, hearts, keepsake, profile))
+
+  # As best_colors: only the colour kernels are scored again, once per
+  # multiset of wildcard colours, and the first best wins a tie. The nth
+  # wildcard in a row takes the nth colour.
+  wild = np.isin(ids, [i for i, card in enumerate(cards) if card.wildcard])
+  wildcards = wild.sum(axis=1)
+  nth = np.cumsum(wild, axis=1) - 1
+  for count in np.unique(wildcards):
+    rows = wildcards == count
+    best_points = None
+    for trial_colors in itertools.combinations_with_replacement(Color, count):
+      values = np.array([color.value for color in trial_colors] + [0])
+      trial = np.where(wild[rows], values[nth[rows]], colors[rows])
+      trial_points = vector_points(
+          colored, ids[rows],
+          HandTerms(trial, hearts[rows], keepsake[rows], profile),
+          points[rows])
+      if best_points is None:
+        best_points, best_colors = trial_points, trial
+        continue
+      better = trial_points > best_points
+      best_points[better] = trial_points[better]
+      best_colors[better] = trial[better]
+    points[rows] = best_points
+    colors[rows] = best_colors
+  return colors, points
+
+
+def vector_stats(stats, names, keys, points):
+  # merge_stats for a whole batch; keys index into names, one row per
+  # arrangement. Fields are added in order of first appearance, like
+  # analyze_arrangement does.
+  summary_stats(stats, names, keys, np.ones_like(points), points, points,
+                points)
+
+
+def summary_stats(stats, names, keys, count, total, most, least):
+  # as vector_stats, for rows that each stand for count hands with the given
+  # total, max and min points
+  flat_keys = keys.ravel()
+  field_count = np.bincount(flat_keys, weights=np.repeat(count, keys.shape[1]),
+                            minlength=len(names))
+  field_total = np.bincount(flat_keys, weights=np.repeat(total, keys.shape[1]),
+                            minlength=len(names))
+  field_most = np.full(len(names), np.iinfo(int).min)
+  field_least = np.full(len(names), np.iinfo(int).max)
+  np.maximum.at(field_most, flat_keys, np.repeat(most, keys.shape[1]))
+  np.minimum.at(field_least, flat_keys, np.repeat(least, keys.shape[1]))
+
+  seen, first = np.unique(flat_keys, return_index=True)
+  merge_stats(stats, {
+      names[key]: [int(field_count[key]), int(field_total[key]),
+                   int(field_most[key]), int(field_least[key])]
+      for key in seen[np.argsort(first)]})
+
+
+def analyze_vectorized(cards: list[Card], kernels, hands,
+                       profile: Profile = None):
+  # hands are scored BATCH_SIZE arrangements at a time, so memory stays flat
+  # however many there are
+  kernels = {[card.name for card in cards].index(name): kernel
+             for name, kernel in kernels.items()}
+  card_index = {id(card): i for i, card in enumerate(cards)}
+  flower_names = [card.name for card in cards]
+  color_names = [None] + [color.name for color in Color]
+
+  histogram = {}
   flower_stats = {}
   color_stats = {}
-  for arrangement in all_arrangements:
-    points = arrangement[1]
-    for flower in arrangement[0]:
-      update_stats(flower_stats, flower.name, points)
-      update_stats(color_stats, flower.color.name, points)
+  for arrangement_ids in batches(hands, card_index):
+    with phase(profile, "scoring"):
+      ids, colors, _, points = vector_arrangements(cards, kernels,
+                                                   arrangement_ids, profile)
+    with phase(profile, "stats"):
+      vector_stats(flower_stats, flower_names, ids, points)
+      vector_stats(color_stats, color_names, colors, points)
+      scores, counts = np.unique(points, return_counts=True)
+      update_histogram(histogram, dict(zip(scores.tolist(),
+                                            counts.tolist())))
+
+  return histogram, flower_stats, color_stats
+
+
+def batches(hands, card_index):
+  # runs of equal length (3-card short hands, then 4-card hands) as card
+  # id arrays of at most BATCH_SIZE rows
+  for _, group in itertools.groupby(hands, key=len):
+    while True:
+      batch = [[card_index[id(card)] for card in arrangement]
+               for arrangement in itertools.islice(group, BATCH_SIZE)]
+      if not batch:
+        break
+      yield np.array(batch)
+
+
+def analyze_python(hands, memo: ScoreMemo = None, profile: Profile = None):
+  histogram = {}
+  flower_stats = {}
+  color_stats = {}
+  for arrangement in hands:
+    analyze_arrangement(arrangement, flower_stats, color_stats, histogram,
+                        memo, profile)
+  return histogram, flower_stats, color_stats
+
+
+# Exact counting. Every (arrangement, keepsake map) of a hand of length L is
+# one of L! orderings of a combination with a given set of keepsakes, and
+# only the positional cards care which ordering. Each (combination,
+# keepsakes) row is scored once without them; the positional cards each
+# score a value summed over their neighbours, so together they add a weight
+# for every adjacent pair in the ordering. How those weights are spread over
+# the L! orderings depends only on each card's (positional card, neighbour
+# values), so it is counted once per distinct set of those and reused.
+
+def unique_rows(rows):
+  # np.unique(rows, axis=0) as (index of each distinct row, inverse), going
+  # through one integer per row, which is much faster than sorting rows
+  rows = rows - rows.min(axis=0)
+  base = int(rows.max()) + 1
+  if base ** rows.shape[1] >= 2 ** 62:
+    _, first, inverse = np.unique(rows, axis=0, return_index=True,
+                                  return_inverse=True)
+  else:
+    codes = rows @ base ** np.arange(rows.shape[1] - 1, -1, -1)
+    _, first, inverse = np.unique(codes, return_index=True,
+                                  return_inverse=True)
+  return first, inverse.ravel()
+
 
-  compute_and_print_stats(flower_stats, LONGEST_NAME_FLOWER)
-  compute_and_print_stats(color_stats, LONGEST_NAME_COLOR)
+def adjacency_distribution(features):
+  # features: per card, (index of its positional scorer or -1, its value
+  # to each positional scorer). Returns the positional points over every
+  # ordering and how many orderings score them.
+  features = np.array(features)
+  scorer, values = features[:, 0], features[:, 1:]
+  weights = np.zeros((len(features), len(features)), dtype=int)
+  for i in np.flatnonzero(scorer >= 0):
+    weights[i] += values[:, scorer[i]]
+  weights += weights.T
+  orderings = np.array(list(itertools.permutations(range(len(features)))))
+  points = weights[orderings[:, :-1], orderings[:, 1:]].sum(axis=1)
+  return np.unique(points, return_counts=True)
+
+
+class AdjacencyCounts:
+  # adjacency_distribution per distinct set of card features, with the
+  # count, total, max and min that stats need
+  def __init__(self):
+    self.distributions = {}
+    self.orderings = 0
+
+  def lookup(self, features):
+    key = tuple(map(tuple, features))
+    try:
+      return self.distributions[key]
+    except KeyError:
+      points, counts = adjacency_distribution(key)
+      self.orderings += counts.sum()
+      summary = (points, counts, (points * counts).sum(), points.max(),
+                 points.min())
+      self.distributions[key] = summary
+      return summary
+
+
+def exact_rows(cards: list[Card], kernels, values, adjacency, combination_ids,
+               profile: Profile = None):
+  # histogram and per-row (count, total, max, min) for every combination
+  # under every set of keepsakes
+  independent = {card_id: kernel for card_id, kernel in kernels.items()
+                 if not cards[card_id].positional}
+  ids, colors, keepsake, points = vector_arrangements(cards, independent,
+                                                      combination_ids, profile)
+  length = ids.shape[1]
+  orderings = math.factorial(length)
+  card_hearts = np.array([card.hearts for card in cards])
+  hearts = card_hearts[ids]
+
+  scorer = np.full(ids.shape, -1)
+  for i, card_id in enumerate(values):
+    scorer[ids == card_id] = i
+  # neighbour values never look at colours (see neighbour_value), so the
+  # wildcards' colours do not matter here
+  terms = HandTerms(colors, hearts, keepsake, profile)
+  neighbour_values = [terms.values(value).astype(int)
+                      for value in values.values()]
+
+  positional_total = np.zeros(len(ids), dtype=int)
+  most = np.zeros(len(ids), dtype=int)
+  least = np.zeros(len(ids), dtype=int)
+  histogram = {}
+  plain = scorer.max(axis=1) < 0
+  scores, counts = np.unique(points[plain], return_counts=True)
+  update_histogram(histogram, dict(zip(scores.tolist(),
+                                       (counts * orderings).tolist())))
+
+  rows = ~plain
+  if rows.any():
+    features = np.stack([scorer[rows]] + [value[rows]
+                                          for value in neighbour_values], axis=2)
+    features = features.reshape(-1, features.shape[2])
+    kinds, kind_ids = unique_rows(features)
+    kind_ids = np.sort(kind_ids.reshape(-1, length), axis=1)
+    hands, hand_ids = unique_rows(kind_ids)
+    summaries = [adjacency.lookup(features[kinds[kind_ids[hand]]])
+                 for hand in hands]
+    positional_total[rows] = np.array([summary[2]
+                                       for summary in summaries])[hand_ids]
+    most[rows] = np.array([summary[3] for summary in summaries])[hand_ids]
+    least[rows] = np.array([summary[4] for summary in summaries])[hand_ids]
+
+    pairs = np.stack([hand_ids, points[rows]], axis=1)
+    first, group_ids = unique_rows(pairs)
+    group_counts = np.bincount(group_ids)
+    for (hand, base), group_count in zip(pairs[first], group_counts):
+      extra, counts = summaries[hand][:2]
+      update_histogram(histogram, dict(zip((base + extra).tolist(),
+                                           (counts * group_count).tolist())))
+
+  count = np.full(len(ids), orderings)
+  total = points * orderings + positional_total
+  return (histogram, ids, colors, count, total, points + most,
+          points + least)
+
+
+def analyze_exact(cards: list[Card], kernels, values, combinations,
+                  profile: Profile = None):
+  kernels = {[card.name for card in cards].index(name): kernel
+             for name, kernel in kernels.items()}
+  values = {[card.name for card in cards].index(name): value
+            for name, value in values.items()}
+  card_index = {id(card): i for i, card in enumerate(cards)}
+  flower_names = [card.name for card in cards]
+  color_names = [None] + [color.name for color in Color]
+
+  adjacency = AdjacencyCounts()
+  histogram = {}
+  flower_stats = {}
+  color_stats = {}
+  rows = 0
+  for combination_ids in batches(combinations, card_index):
+    with phase(profile, "scoring"):
+      (batch_histogram, ids, colors, count, total, most,
+       least) = exact_rows(cards, kernels, values, adjacency, combination_ids,
+                           profile)
+    with phase(profile, "stats"):
+      summary_stats(flower_stats, flower_names, ids, count, total, most,
+                    least)
+      summary_stats(color_stats, color_names, colors, count, total, most,
+                    least)
+      update_histogram(histogram, batch_histogram)
+    rows += len(ids)
+
+  work = {'hands scored': rows, 'orderings counted': int(adjacency.orderings)}
+  return histogram, flower_stats, color_stats, work
+
+
+# Sampling. Hands are drawn uniformly from the same (arrangement, keepsake
+# map) population the other engines enumerate, SAMPLE_BATCH at a time, until
+# every field's mean is known to within the requested confidence interval.
+
+class SampleStats:
+  # Running sums for each field's mean points. A hand counts once per card
+  # it has in the field (twice for RED with two red cards), so the mean is a
+  # ratio estimate and its variance is taken over whole hands.
+  def __init__(self, names):
+    self.names = names
+    self.hands = 0
+    self.count = np.zeros(len(names))
+    self.total = np.zeros(len(names))
+    self.weight_squares = np.zeros(len(names))
+    self.weighted_points = np.zeros(len(names))
+    self.weighted_squares = np.zeros(len(names))
+    self.most = np.full(len(names), np.iinfo(int).min)
+    self.least = np.full(len(names), np.iinfo(int).max)
+
+  def update(self, keys, points):
+    weights = np.zeros((len(keys), len(self.names)))
+    np.add.at(weights, (np.arange(len(keys))[:, np.newaxis], keys), 1)
+    points = points[:, np.newaxis]
+    self.hands += len(keys)
+    self.count += weights.sum(axis=0)
+    self.total += (weights * points).sum(axis=0)
+    self.weight_squares += (weights ** 2).sum(axis=0)
+    self.weighted_points += (weights ** 2 * points).sum(axis=0)
+    self.weighted_squares += (weights ** 2 * points ** 2).sum(axis=0)
+    present = weights > 0
+    self.most = np.maximum(self.most, np.where(present, points,
+                                               np.iinfo(int).min).max(axis=0))
+    self.least = np.minimum(self.least, np.where(present, points,
+                                                 np.iinfo(int).max).min(axis=0))
+
+  def errors(self):
+    # half width of each field's confidence interval (inf until seen twice)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      mean = self.total / self.count
+      residual = (self.weighted_squares - 2 * mean * self.weighted_points +
+                  mean ** 2 * self.weight_squares)
+      variance = (residual / self.count ** 2 * self.hands /
+                  max(self.hands - 1, 1))
+      errors = CONFIDENCE_Z * np.sqrt(np.maximum(variance, 0))
+    return np.where(self.count > 1, errors, np.inf)
+
+  def stats(self):
+    return {name: [int(self.count[i]), int(self.total[i]), int(self.most[i]),
+                   int(self.least[i])]
+            for i, name in enumerate(self.names) if self.count[i]}
+
+
+def sample_hands(cards: list[Card], hand_size, rng, size):
+  # ids of size hands drawn uniformly from every arrangement; hands with the
+  # short-hand card (a shorter array) come in proportion to how many of them
+  # there are
+  short_ids = [i for i, card in enumerate(cards) if card.short_hand]
+  other_ids = np.array([i for i, card in enumerate(cards)
+                        if not card.short_hand])
+  others = len(other_ids)
+  short_hands = (math.comb(others, hand_size - 2) *
+                 math.factorial(hand_size - 1) * 2 ** (hand_size - 1)
+                 if short_ids else 0)
+  other_hands = math.perm(others, hand_size) * 2 ** hand_size
+  short = rng.binomial(size, short_hands / (short_hands + other_hands))
+
+  def draw(count, length):
+    # distinct others in a random order
+    return other_ids[rng.random((count, others)).argsort(axis=1)[:, :length]]
+
+  with_short = np.concatenate(
+      [draw(short, hand_size - 2),
+       np.full((short, 1), (short_ids or [0])[0])], axis=1)
+  order = rng.random(with_short.shape).argsort(axis=1)
+  return (np.take_along_axis(with_short, order, axis=1),
+          draw(size - short, hand_size))
+
+
+def analyze_sampled(cards: list[Card], kernels, hand_size, ci_width,
+                    max_hands, seed=None, profile: Profile = None):
+  kernels = {[card.name for card in cards].index(name): kernel
+             for name, kernel in kernels.items()}
+  flower_stats = SampleStats([card.name for card in cards])
+  color_stats = SampleStats([None] + [color.name for color in Color])
+  rng = np.random.default_rng(seed)
+
+  histogram = {}
+  widest = math.inf
+  while flower_stats.hands < max_hands:
+    for ids in sample_hands(cards, hand_size, rng, SAMPLE_BATCH):
+      if not len(ids):
+        continue
+      keepsake = rng.random(ids.shape) < 0.5
+      with phase(profile, "scoring"):
+        colors, points = vector_hands(cards, kernels, ids, keepsake, profile)
+      with phase(profile, "stats"):
+        flower_stats.update(ids, points)
+        color_stats.update(colors, points)
+        scores, counts = np.unique(points, return_counts=True)
+        update_histogram(histogram, dict(zip(scores.tolist(),
+                                              counts.tolist())))
+    # fields no hand has (colours missing from the deck) never narrow
+    widest = 2 * max(sample.errors()[sample.count > 0].max()
+                     for sample in (flower_stats, color_stats))
+    if widest <= ci_width:
+      break
+
+  return histogram, flower_stats, color_stats, widest
+
+
+# Card rules. A deck is a list of cards as loaded from a JSON file:
+#   {"name": ..., "color": "PINK", "hearts": 1, "rule": {...},
+#    "wildcard": true, "short_hand": true}
+# with "rule", "wildcard" and "short_hand" optional; at most one card (the
+# base game's Marigold) can make hands one card short. A rule scores the
+# card from a term:
+#   {"type": "count", "term": T, "add": N}  T's hand total (plus N)
+#   {"type": "threshold", "term": T, "equals": N, "points": P}
+#                                          P if T's hand total is N, else 0
+#   {"type": "adjacent", "value": T}       T summed over the card's neighbours
+# Terms are per-card values (CARD_TERMS, or a colour name: 1 for cards of
+# that colour) summed over the hand, or "colors", the number of distinct
+# colours in the hand. Rules compile both to Card scoring and to numpy
+# kernels.
+
+CARD_TERMS = {
+    "hearts": lambda card: card.hearts,
+    "keepsakes": lambda card: card.keepsake,
+    "non-keepsakes": lambda card: not card.keepsake,
+    "no-hearts": lambda card: card.hearts == 0,
+}
+
+# the same terms as arrays with one value per position
+ARRAY_TERMS = {
+    "hearts": lambda colors, hearts, keepsake: hearts,
+    "keepsakes": lambda colors, hearts, keepsake: keepsake,
+    "non-keepsakes": lambda colors, hearts, keepsake: ~keepsake,
+    "no-hearts": lambda colors, hearts, keepsake: hearts == 0,
+}
+
+
+def load_deck(path):
+  with open(path) as deck_file:
+    deck = json.load(deck_file)
+  # compiled once here so a bad rule fails before any work starts
+  short = [entry['name'] for entry in deck if entry.get('short_hand')]
+  if len(short) > 1:
+    raise ValueError("only one card can be short_hand, not {}".format(
+        ", ".join(short)))
+  make_cards(deck)
+  make_kernels(deck)
+  return deck
+
+
+def color_term(entry, term):
+  # points of a colour term from the hand's colour counts, or None for
+  # other terms
+  if term == "colors":
+    return lambda counts: sum(1 for count in counts.values() if count)
+  if term in Color.__members__:
+    return lambda counts: counts[Color[term]]
+  if term not in CARD_TERMS:
+    raise ValueError("{}: unknown term {!r}".format(entry['name'], term))
+  return None
+
+
+def rule_points(entry):
+  # the rule's points from its term's hand total; works on ints and arrays
+  rule = entry['rule']
+  if rule['type'] == "count":
+    add = rule.get('add', 0)
+    return lambda total: total + add
+  if rule['type'] == "threshold":
+    equals, points = rule['equals'], rule['points']
+    return lambda total: (total == equals) * points
+  raise ValueError("{}: unknown rule type {!r}".format(entry['name'],
+                                                       rule['type']))
+
+
+def neighbour_value(entry):
+  # term of an adjacent rule; colours are not allowed, as the wildcards are
+  # coloured from colour counts alone
+  value = entry['rule']['value']
+  if value not in CARD_TERMS:
+    raise ValueError("{}: adjacent rules take one of {}, not {!r}".format(
+        entry['name'], ", ".join(CARD_TERMS), value))
+  return value
+
+
+def compile_scoring(entry):
+  # Card scoring for the entry's rule, and whether it is positional
+  rule = entry.get('rule')
+  if rule is None:
+    return no_scoring, False
+  if rule['type'] == "adjacent":
+    value = CARD_TERMS[neighbour_value(entry)]
+    return (lambda cards, position: sum(
+        value(card) for card in get_adjacent(cards, position))), True
+  term = rule['term']
+  points = rule_points(entry)
+  counts_term = color_term(entry, term)
+  if counts_term:
+    return color_scoring(lambda counts: points(counts_term(counts))), False
+  value = CARD_TERMS[term]
+  return (lambda cards, _: points(
+      sum(value(card) for card in cards))), False
+
+
+def compile_kernel(entry):
+  # array kernel for the entry's rule, or None for cards without one
+  rule = entry.get('rule')
+  if rule is None:
+    return None
+  if rule['type'] == "adjacent":
+    value = neighbour_value(entry)
+    return lambda terms: count_adjacent(terms.values(value))
+  term = rule['term']
+  points = rule_points(entry)
+  color_term(entry, term)
+  return lambda terms: points(terms.total(term))
+
+
+def make_cards(deck):
+  cards = []
+  for entry in deck:
+    scoring, positional = compile_scoring(entry)
+    cards.append(Card(entry['name'], Color[entry['color']], entry['hearts'],
+                      scoring, positional=positional,
+                      wildcard=entry.get('wildcard', False),
+                      short_hand=entry.get('short_hand', False)))
+  return cards
+
+
+def make_neighbour_values(deck):
+  # the term each positional card scores per neighbour
+  return {entry['name']: neighbour_value(entry) for entry in deck
+          if entry.get('rule', {}).get('type') == "adjacent"}
+
+
+def make_kernels(deck):
+  # the same scoring as make_cards, as array kernels over HandTerms; cards
+  # without scoring have no kernel
+  kernels = {entry['name']: compile_kernel(entry) for entry in deck}
+  return {name: kernel for name, kernel in kernels.items() if kernel}
+
+
+def analyze_shard(engine, shard, deck, profiled=False):
+  # runs in a worker: cards are compiled here from the deck since their
+  # scoring lambdas cannot be pickled
+  cards = make_cards(deck)
+  kernels = make_kernels(deck)
+  profile = None
+  if profiled:
+    profile = Profile()
+    kernels = profile.instrument(cards, kernels)
+  if engine == 'exact':
+    return analyze_exact(cards, kernels, make_neighbour_values(deck),
+                         shard_combinations(cards, shard),
+                         profile) + (profile,)
+  hands = shard_arrangements(cards, shard)
+  work = {}
+  if engine == 'numpy':
+    return analyze_vectorized(cards, kernels, hands, profile) + (work,
+                                                                 profile)
+  if engine == 'memo':
+    # one memo per shard keeps it bounded; a shard holds every ordering of
+    # its short hands and the orderings of other hands after their first
+    # card
+    memo = ScoreMemo()
+    results = analyze_python(hands, memo, profile)
+    memoized = sum(len(scores) for scores in memo.scores.values())
+    work = {'scorer calls': memo.calls, 'scorer calls skipped': memo.skipped,
+            'memoized scores': memoized}
+    return results + (work, profile)
+  return analyze_python(hands, profile=profile) + (work, profile)
+
+
+def analyze(engine, deck, workers=1, hand_size=HAND_SIZE, profiled=False):
+  # profiled: also returns a Profile of every shard, else None
+  jobs = [(engine, shard, deck, profiled)
+          for shard in shards(make_cards(deck), hand_size)]
+  if workers == 1:
+    results = itertools.starmap(analyze_shard, jobs)
+  else:
+    with Pool(workers) as pool:
+      results = pool.starmap(analyze_shard, jobs)
+
+  # merged in shard order, so the output is identical to a single pass
+  histogram = {}
+  flower_stats = {}
+  color_stats = {}
+  work = {}
+  profile = Profile() if profiled else None
+  for (shard_histogram, shard_flower_stats, shard_color_stats, shard_work,
+       shard_profile) in results:
+    update_histogram(histogram, shard_histogram)
+    merge_stats(flower_stats, shard_flower_stats)
+    merge_stats(color_stats, shard_color_stats)
+    update_histogram(work, shard_work)
+    if profile:
+      profile.merge(shard_profile)
+  return histogram, flower_stats, color_stats, work, profile
+
+
+def cache_path(cache_dir, deck, options):
+  # results depend only on the cards and the run options, so those (with
+  # CACHE_VERSION, bumped when the scoring code changes) are the key
+  key = json.dumps([CACHE_VERSION, deck, options], sort_keys=True)
+  return os.path.join(cache_dir, "{}.npz".format(
+      hashlib.sha256(key.encode()).hexdigest()))
+
+
+def save_results(path, histogram, flower_stats, color_stats, errors, work):
+  # histogram and stats as integer arrays; errors (per field name, sampling
+  # only) and work as JSON
+  arrays = {'histogram': np.array(sorted(histogram.items()), dtype=np.int64),
+            'info': np.array(json.dumps({'errors': errors, 'work': work}))}
+  for field, stats in (('flower', flower_stats), ('color', color_stats)):
+    arrays[field + '_names'] = np.array(list(stats))
+    arrays[field + '_stats'] = np.array(list(stats.values()), dtype=np.int64)
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  # written under another name first, so an interrupted run leaves no
+  # partial file behind
+  with open(path + '.tmp', 'wb') as cache_file:
+    np.savez_compressed(cache_file, **arrays)
+  os.replace(path + '.tmp', path)
+
+
+def load_results(path):
+  with np.load(path) as arrays:
+    histogram = dict(arrays['histogram'].tolist())
+    flower_stats, color_stats = (
+        dict(zip(arrays[field + '_names'].tolist(),
+                 arrays[field + '_stats'].tolist()))
+        for field in ('flower', 'color'))
+    info = json.loads(arrays['info'].item())
+  return histogram, flower_stats, color_stats, info['errors'], info['work']
+
+
+def write_csv(path, histogram):
+  scores = range(min(histogram), max(histogram) + 1)
+  sum_all = sum(histogram.values())
+  sum_counts = 0
+  with open(path, 'w', newline='') as csv_file:
+    writer = csv.writer(csv_file)
+    writer.writerow(['score', 'count', 'cumulative percent'])
+    for score in scores:
+      count = histogram.get(score, 0)
+      sum_counts += count
+      writer.writerow([score, count, '{:.2f}'.format(sum_counts/sum_all*100)])
+
+
+def plot_histogram(histogram, png=None):
+  # matplotlib is only imported when a plot is wanted, and never opens a
+  # window when writing a PNG
+  import matplotlib
+  if png:
+    matplotlib.use('Agg')
+  import matplotlib.pyplot as plt
 
   fig, axs = plt.subplots(1, 1, sharey=True, tight_layout=True)
-  counts, edges, bars = axs.hist(all_points, bins=14)
+  scores = range(min(histogram), max(histogram) + 1)
+  counts = [histogram.get(score, 0) for score in scores]
+  bars = axs.bar(scores, counts, width=1, edgecolor='white')
+  plt.bar_label(bars)
+  if png:
+    fig.savefig(png)
+  else:
+    plt.show()
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--engine',
+                      choices=['numpy', 'python', 'memo', 'exact', 'sample'],
+                      default='numpy',
+                      help='score hands in array batches (numpy), one at a '
+                      'time, colouring the wildcards once per arrangement '
+                      'and scoring every keepsake map (python), one at a '
+                      'time reusing the order-independent part of the score '
+                      'across orderings of the same hand (memo), once per '
+                      'combination, counting orderings instead of visiting '
+                      'them (exact), or estimate the stats from random hands '
+                      '(sample)')
+  parser.add_argument('--cards', default=DECK_FILE,
+                      help='JSON file of the cards and their scoring rules '
+                      '(default: the base game)')
+  parser.add_argument('--hand-size', type=int, default=HAND_SIZE,
+                      help='cards in a hand (short hands have one fewer); '
+                      'past 4, only the exact engine finishes in reasonable '
+                      'time')
+  parser.add_argument('--workers', type=int, default=1,
+                      help='split the enumeration by first card over this '
+                      'many processes (0: one per CPU); sampling runs in one')
+  parser.add_argument('--ci-width', type=float, default=0.05,
+                      help='sample until every average is known to within a '
+                      '95%% confidence interval this wide, in points')
+  parser.add_argument('--max-hands', type=int, default=10 ** 8,
+                      help='stop sampling after this many hands regardless')
+  parser.add_argument('--seed', type=int,
+                      help='random seed for sampling (sampling without one '
+                      'is never cached)')
+  parser.add_argument('--cache-dir', default=CACHE_DIR,
+                      help='where results are kept between runs, keyed by '
+                      'the cards and options')
+  parser.add_argument('--no-cache', action='store_true',
+                      help='neither read nor write cached results')
+  parser.add_argument('--png',
+                      help='write the histogram plot to this file instead of '
+                      'showing it')
+  parser.add_argument('--csv',
+                      help='write the histogram to this CSV file')
+  parser.add_argument('--no-plot', action='store_true',
+                      help='do not show the histogram plot')
+  parser.add_argument('--profile', metavar='FILE',
+                      help='time every card\'s scoring and the analysis '
+                      'phases, print them slowest first and write them to '
+                      'this JSON file (never cached)')
+  args = parser.parse_args()
+  if args.workers < 0:
+    parser.error('--workers must be 0 or more')
+  args.workers = args.workers or None
+  if args.hand_size < 3:
+    parser.error('--hand-size must be at least 3')
+  if args.max_hands < 1:
+    parser.error('--max-hands must be at least 1')
+  try:
+    deck = load_deck(args.cards)
+  except (OSError, ValueError, KeyError) as error:
+    parser.error('--cards: {}'.format(error))
+
+  # the engine is in the key for its work counts (and sampling for its
+  # estimates); every enumerating engine gives the same stats
+  options = {'engine': args.engine, 'hand size': args.hand_size}
+  if args.engine == 'sample':
+    options.update({'ci width': args.ci_width, 'max hands': args.max_hands,
+                    'seed': args.seed})
+  path = cache_path(args.cache_dir, deck, options)
+  cached = not (args.no_cache or args.profile) and (
+      args.engine != 'sample' or args.seed is not None)
+
+  if cached and os.path.exists(path):
+    (histogram, flower_stats, color_stats, errors,
+     work) = load_results(path)
+  else:
+    errors = None
+    if args.engine == 'sample':
+      cards = make_cards(deck)
+      kernels = make_kernels(deck)
+      profile = None
+      if args.profile:
+        profile = Profile()
+        kernels = profile.instrument(cards, kernels)
+      histogram, flower_sample, color_sample, widest = analyze_sampled(
+          cards, kernels, args.hand_size, args.ci_width, args.max_hands,
+          args.seed, profile)
+      flower_stats = flower_sample.stats()
+      color_stats = color_sample.stats()
+      errors = {name: float(error)
+                for sample in (flower_sample, color_sample)
+                for name, error in zip(sample.names, sample.errors())
+                if name in flower_stats or name in color_stats}
+      work = {'widest': float(widest)}
+    else:
+      histogram, flower_stats, color_stats, work, profile = analyze(
+          args.engine, deck, args.workers, args.hand_size,
+          bool(args.profile))
+    if cached:
+      save_results(path, histogram, flower_stats, color_stats, errors, work)
+
+  # Data plotting, analysis
+
+  longest_name_flower = max(len(entry['name']) for entry in deck)
+  compute_and_print_stats(flower_stats, longest_name_flower, errors)
+  compute_and_print_stats(color_stats, LONGEST_NAME_COLOR, errors)
+
+  scores = range(min(histogram), max(histogram) + 1)
+  counts = [histogram.get(score, 0) for score in scores]
 
   sum_counts = 0
   sum_all = sum(counts)
 
-  for i, count in enumerate(counts):
+  for score, count in zip(scores, counts):
     sum_counts += count
-    print("{} count: {} {:.2f}%".format(i+1, count, sum_counts/sum_all*100))
+    print("{} count: {} {:.2f}%".format(score, count, sum_counts/sum_all*100))
 
-  plt.bar_label(bars)
-  plt.show()
+  if args.engine == 'sample':
+    widest = work['widest']
+    print("sample: {} hands, widest 95% interval \u00b1{:.3f} points{}".format(
+        sum_all, widest / 2, "" if widest <= args.ci_width else
+        " (stopped at --max-hands before reaching {})".format(args.ci_width)))
+
+  if args.engine == 'exact':
+    print("exact: {} hands counted from {} scored combinations and {} "
+          "enumerated orderings".format(sum_all, work['hands scored'],
+                                        work['orderings counted']))
+
+  if args.engine == 'memo':
+    total_calls = work['scorer calls'] + work['scorer calls skipped']
+    print("memo: {} scores kept, {} of {} scorer calls skipped ({:.1f}%)".format(
+        work['memoized scores'], work['scorer calls skipped'], total_calls,
+        work['scorer calls skipped'] / total_calls * 100))
+
+  if args.profile:
+    profile.print_table(longest_name_flower)
+    profile.dump(args.profile)
+
+  if args.csv:
+    write_csv(args.csv, histogram)
+  if args.png or not (args.csv or args.no_plot):
+    plot_histogram(histogram, args.png)